@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import math
+import random
+import argparse
+import platform
+from time import perf_counter
+from Grader import ROOT, BACKENDS, names, names_to_directories, load_functions
+
+RESULTS_PATH = os.path.join(ROOT, "benchmark.json")
+BASELINE_PATH = os.path.join(ROOT, "benchmark_baseline.json")
+THRESHOLD = 1.25 # a time this many times the baseline (or 1/THRESHOLD of it) counts as a change
+MIN_TIME = 0.05 # seconds each round of calls runs for
+REPEATS = 5 # rounds per size; the fastest is kept
+SAMPLES = 4 # different inputs cycled through at each size
+LENGTHS = [256, 4096, 65536] # characters or blocks
+BLOCK_SIZE = 4
+MERSENNE_BITS = [61, 127, 521, 1279] # sizes of the primes 2^k - 1 used for primality tests
+EXP_MODULI = {17: 2**16 + 1, 31: 2**31 - 1, 61: 2**61 - 1, 127: 2**127 - 1, 521: 2**521 - 1} # bits -> prime p
+EXP_BLOCKS = 64 # blocks encrypted per exp_* call
+PRIME_SEARCH_BITS = [32, 64, 128, 256, 512] # sizes of n for next_prime, timed next to next_probable_prime
+WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37) # Miller-Rabin bases proving primality below 3.18 * 10^23
+
+def _is_prime(n):
+    """Deterministic Miller-Rabin for the n < 3.18 * 10^23 used here, kept
+    separate from the code being benchmarked so its inputs never change."""
+    if n < 2: return False
+    for p in WITNESSES:
+        if n % p == 0: return n == p
+    e = (n - 1 & 1 - n).bit_length() - 1
+    for b in WITNESSES:
+        x = pow(b, n - 1 >> e, n)
+        if x == 1 or x == n - 1: continue
+        for _ in range(e - 1):
+            x = x * x % n
+            if x == n - 1: break
+        else:
+            return False
+    return True
+
+def _random_prime(bits, rng):
+    while True:
+        n = rng.getrandbits(bits) | 1 << bits - 1 | 1
+        if _is_prime(n): return n
+
+def _semiprime(bits, rng):
+    return (_random_prime(bits // 2, rng) * _random_prime(bits - bits // 2, rng),)
+
+def _message(length, rng):
+    return ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz ,.!?é🐶', k=length)), BLOCK_SIZE
+
+def _encoded(length, rng):
+    """Blocks of a random message of length characters, encoded here
+    (big-endian, zero padded) rather than by the code being timed."""
+    data = _message(length, rng)[0].encode()
+    data += bytes(-len(data) % BLOCK_SIZE)
+    return [int.from_bytes(data[i:i + BLOCK_SIZE], 'big') for i in range(0, len(data), BLOCK_SIZE)], BLOCK_SIZE
+
+def _blocks(length, rng):
+    return [rng.getrandbits(8 * BLOCK_SIZE) for _ in range(length)]
+
+def _affine_input(length, rng):
+    return _blocks(length, rng), (rng.getrandbits(8 * BLOCK_SIZE) | 1, rng.getrandbits(8 * BLOCK_SIZE)), BLOCK_SIZE
+
+def _exp_input(bits, rng):
+    p, key = EXP_MODULI[bits], 65537
+    while math.gcd(key, p - 1) != 1: key += 2
+    return [rng.randrange(1, p) for _ in range(EXP_BLOCKS)], key, p
+
+def _two_numbers(bits, rng):
+    return rng.getrandbits(bits) | 1 << bits - 1, rng.getrandbits(bits) | 1
+
+# (name, function (size, rng) -> args, sizes[, seed]): each function of
+# functions.py is timed at every size, on SAMPLES inputs made from an rng
+# seeded with seed (by default name), so cases with the same seed get the
+# same inputs.
+CASES = [
+    ("block_encode", _message, LENGTHS),
+    ("block_decode", _encoded, LENGTHS),
+    ("affine_encrypt", _affine_input, LENGTHS),
+    ("affine_decrypt", _affine_input, LENGTHS),
+    ("exp_encrypt", _exp_input, list(EXP_MODULI)),
+    ("exp_decrypt", _exp_input, list(EXP_MODULI)),
+    ("gcd", _two_numbers, [64, 512, 4096, 32768]),
+    ("egcd", _two_numbers, [64, 512, 4096, 32768]),
+    ("multiplicative_inverse", lambda bits, rng: (rng.getrandbits(bits) | 1, 2**bits), [64, 512, 4096, 32768]),
+    ("factor", _semiprime, [24, 40, 56]),
+    ("euler_phi", _semiprime, [24, 40, 56]),
+    ("is_prime", lambda bits, rng: (_random_prime(bits, rng),), [16, 24, 32]),
+    ("is_strong_pseudoprime", lambda bits, rng: (2**bits - 1, 2), MERSENNE_BITS),
+    ("is_probably_prime", lambda bits, rng: (2**bits - 1,), MERSENNE_BITS),
+    ("next_probable_prime", lambda bits, rng: (rng.getrandbits(bits),), PRIME_SEARCH_BITS, "prime search"),
+    ("next_prime", lambda bits, rng: (rng.getrandbits(bits),), PRIME_SEARCH_BITS, "prime search"),
+]
+
+def time_calls(function, inputs, min_time=MIN_TIME, repeats=REPEATS):
+    """Seconds per call of function, cycling through inputs: the fastest of
+    repeats rounds, each running for at least min_time."""
+    best = math.inf
+    for _ in range(repeats):
+        calls, start = 0, perf_counter()
+        while (elapsed := perf_counter() - start) < min_time or calls == 0:
+            function(*inputs[calls % len(inputs)])
+            calls += 1
+        best = min(best, elapsed / calls)
+    return best
+
+def run(module, cases=CASES, min_time=MIN_TIME, repeats=REPEATS):
+    """Time every case on module, printing each result as it comes.
+
+    Returns:
+        results: results[name][str(size)] is the seconds per call
+    """
+    results = {}
+    for name, make_args, sizes, *seed in cases:
+        function = getattr(module, name, None)
+        if function is None:
+            print(f"{name:24} missing")
+            continue
+        results[name] = {}
+        for size in sizes:
+            rng = random.Random(f"{seed[0] if seed else name} {size}")
+            inputs = [make_args(size, rng) for _ in range(SAMPLES)]
+            results[name][str(size)] = time_calls(function, inputs, min_time, repeats)
+            print(f"{name:24} {size:>6} {results[name][str(size)] * 1e6:12.1f}us", flush=True)
+    return results
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Compare results with baseline (both as returned by run).
+
+    Returns:
+        rows (name, size, old, new, ratio, verdict) for every case and size
+        timed in both, where ratio = new / old and verdict is 'slower',
+        'faster' or '' as ratio is above threshold, below 1 / threshold or
+        neither
+
+    Examples:
+        >>> compare({'gcd': {'64': 3.0, '512': 1.0}}, {'gcd': {'64': 2.0, '512': 1.0}})
+        [('gcd', '64', 2.0, 3.0, 1.5, 'slower'), ('gcd', '512', 1.0, 1.0, 1.0, '')]
+    """
+    rows = []
+    for name, timings in results.items():
+        for size, new in timings.items():
+            old = baseline.get(name, {}).get(size)
+            if old is None: continue
+            ratio = new / old
+            verdict = 'slower' if ratio > threshold else 'faster' if ratio < 1 / threshold else ''
+            rows.append((name, size, old, new, ratio, verdict))
+    return rows
+
+def print_comparison(rows):
+    print(f"\n{'function':24} {'size':>6} {'baseline':>12} {'now':>12} {'ratio':>7}")
+    for name, size, old, new, ratio, verdict in rows:
+        print(f"{name:24} {size:>6} {old * 1e6:10.1f}us {new * 1e6:10.1f}us {ratio:6.2f}x {verdict}")
+    slower = sum(row[-1] == 'slower' for row in rows)
+    faster = sum(row[-1] == 'faster' for row in rows)
+    print(f"\n{slower} slower, {faster} faster, {len(rows) - slower - faster} unchanged")
+
+def write_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark a student's functions.py against a stored baseline.")
+    parser.add_argument("name", nargs="?", default=names[0], help="student whose functions.py is timed")
+    parser.add_argument("--only", help="comma separated functions to time")
+    parser.add_argument("--output", default=RESULTS_PATH, help="where to write the results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="ratio to the baseline that counts as a change")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="seconds per round of calls")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="rounds per size")
+    parser.add_argument("--backend", choices=BACKENDS, help="CRYPTO_BACKEND to time under (see Arithmetic.py)")
+    args = parser.parse_args(argv)
+
+    if args.backend: os.environ["CRYPTO_BACKEND"] = args.backend
+    # What Arithmetic picks when CRYPTO_BACKEND is not set.
+    backend = os.environ.get("CRYPTO_BACKEND") or BACKENDS[-1]
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("backend", backend) != backend:
+            print(f"{args.baseline} was timed with the {baseline['backend']} backend, not {backend}; "
+                  "pass --backend or another --baseline")
+            return 2
+        baseline = baseline["results"]
+    _, directory = next(names_to_directories([args.name]))
+    module = load_functions(os.path.join(ROOT, directory))
+    cases = [case for case in CASES if args.only is None or case[0] in args.only.split(',')]
+    results = run(module, cases, args.min_time, args.repeats)
+    report = {"name": args.name, "backend": backend, "python": platform.python_version(), "machine": platform.platform(), "results": results}
+    if baseline is None:
+        write_report(report, args.output)
+        if args.save_baseline:
+            write_report(report, args.baseline)
+            print(f"\nsaved baseline to {args.baseline}")
+        else:
+            print(f"\nno baseline at {args.baseline}, run with --save-baseline to store one")
+        return 0
+    rows = compare(results, baseline, args.threshold)
+    # A busy machine can slow a whole stretch of the run, so time what looks slower once more.
+    flagged = {(row[0], row[1]) for row in rows if row[-1] == 'slower'}
+    retry = [(name, make_args, [size for size in sizes if (name, str(size)) in flagged], *seed) for name, make_args, sizes, *seed in cases]
+    retry = [case for case in retry if case[2]]
+    if retry:
+        print(f"\ntiming {len(flagged)} slower cases again")
+        for name, timings in run(module, retry, args.min_time, args.repeats).items():
+            for size, seconds in timings.items():
+                results[name][size] = min(results[name][size], seconds)
+        rows = compare(results, baseline, args.threshold)
+    write_report(report, args.output)
+    print_comparison(rows)
+    return 1 if any(row[-1] == 'slower' for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,64 @@
 import os
+import sys
+import json
+import math
+import queue
+import random
+import signal
+import threading
+import subprocess
 import importlib.util
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 
 names = ["Agniv Sarkar"]
 
+ROOT = os.path.dirname(os.path.abspath(__file__))
+REPORT_PATH = os.path.join(ROOT, "grades.json")
+IMPORT_TIMEOUT = 60 # seconds to import a student's functions.py
+TEST_TIMEOUT = 10 # seconds of wall-clock time per test
+WORKERS = os.cpu_count() # students graded at the same time
+# Big-integer backends every student is graded under, as CRYPTO_BACKEND (see Arithmetic.py).
+BACKENDS = ["python"] + (["gmpy2"] if find_spec("gmpy2") else [])
+SCALING_TIMEOUT = 60 # seconds of wall-clock time per scaling test
+SCALING_BITS = [16, 32, 64, 128, 256, 512, 1024, 2048] # input sizes timed by the scaling tests
+MERSENNE_BITS = [17, 31, 61, 89, 127, 521, 607, 1279] # sizes of the primes 2^k - 1 used instead for prime inputs
+SCALING_BUDGET = 0.5 # seconds a call may always take; past that it may only grow by bits^SCALING_EXPONENT
+SCALING_EXPONENT = 4 # largest allowed slope of log(time per call) against log(bits)
+SCALING_TAIL = 3 # largest timed sizes the slope is fitted over, past the fixed costs of small inputs
+SCALING_MIN_TIME = 0.02 # seconds each size is timed for
+
+TESTS = [
+    ("block_encode", ['dog: 🐶', 4], [1685022522, 552640400, 3053453312]),
+    ("block_decode", [[1685022522, 552640400, 3053453312], 4], 'dog: 🐶'),
+    ("affine_encrypt", [[1685022522, 552640400, 3053453312], (123456789, 987654321), 4], [4115223155, 1183960961, 685664433]),
+    ("gcd", [2024, 748], 44),
+    ("egcd", [2024, 748], (44, -7, 19)),
+    ("multiplicative_inverse", [33, 256], 225),
+    ("affine_decrypt", [[4115223155, 1183960961, 685664433], (123456789, 987654321), 4], [1685022522, 552640400, 3053453312]),
+]
+
+def _two_numbers(bits, rng):
+    return rng.getrandbits(bits) | 1 << bits - 1, rng.getrandbits(bits) | 1
+
+def _exp_input(bits, rng):
+    """Blocks, a key about as large as p, and p = 2^bits - 1, so that the
+    work grows with bits even for an exponentiation done key by key."""
+    p = 2**bits - 1
+    key = rng.randrange(3, p) | 1
+    while math.gcd(key, p - 1) != 1: key += 2
+    return [rng.randrange(p) for _ in range(4)], key, p
+
+# Functions timed over growing input sizes, with a function (bits, rng) -> args.
+SCALING_TESTS = [
+    ("gcd", _two_numbers, SCALING_BITS),
+    ("egcd", _two_numbers, SCALING_BITS),
+    ("multiplicative_inverse", lambda bits, rng: (rng.getrandbits(bits) | 1, 2**bits), SCALING_BITS),
+    ("is_probably_prime", lambda bits, rng: (2**bits - 1,), MERSENNE_BITS),
+    ("exp_encrypt", _exp_input, MERSENNE_BITS),
+]
+
 def names_to_directories(names):
     for name in names:
         split = name.split()
@@ -11,41 +67,206 @@ def names_to_directories(names):
             second += ' ' + split[2]
         yield name, f"{second}, {first} - Cryptography"
 
-def test_function(func_name, args, expected_result, module, name):
+def test_function(func_name, args, expected_result, module):
+    """Run one test, returning a report entry."""
+    start = perf_counter()
     try:
         result = getattr(module, func_name)(*args)
-        if result != expected_result:
-            print(f'{name} code fails on {func_name}')
-            return False
-        return True
+        error = None if result == expected_result else 'wrong answer'
+    except Exception as e:
+        error = f'exception {e!r}'
+    return {"test": func_name, "passed": error is None, "seconds": perf_counter() - start, "error": error}
+
+def fit_exponent(bits, seconds):
+    """Least squares slope of log(seconds) against log(bits), i.e. the k
+    for which the running time grows like bits^k.
+
+    Examples:
+        >>> round(fit_exponent([16, 32, 64], [1, 8, 64]), 6)
+        3.0
+    """
+    x, y = [math.log(b) for b in bits], [math.log(max(s, 1e-9)) for s in seconds]
+    mx, my = sum(x) / len(x), sum(y) / len(y)
+    spread = sum((xi - mx) ** 2 for xi in x)
+    return sum((xi - mx) * (yi - my) for xi, yi in zip(x, y)) / spread if spread else 0.0
+
+def _over_budget(signum, frame):
+    raise TimeoutError
+
+def scaling_test(func_name, make_args, sizes, module):
+    """Time func_name on inputs of each size in sizes and fit the growth
+    exponent over the largest SCALING_TAIL of them. Returns a report entry,
+    which fails if the exponent is over SCALING_EXPONENT.
+
+    A call taking longer than SCALING_BUDGET and than the time at the
+    previous size grown by bits^SCALING_EXPONENT already shows too fast a
+    growth, so it fails the test without the remaining sizes. Where there
+    is SIGALRM such a call is interrupted, so brute force fails fast
+    instead of running into SCALING_TIMEOUT.
+    """
+    start = perf_counter()
+    rng = random.Random(func_name)
+    function = getattr(module, func_name, None)
+    entry = {"test": f"{func_name} scaling", "passed": False, "seconds": None, "error": None, "timings": {}}
+    if function is None:
+        entry["error"] = "missing"
+        return entry
+    timed, times = [], []
+    alarm = hasattr(signal, 'setitimer')
+    if alarm: signal.signal(signal.SIGALRM, _over_budget)
+    try:
+        for bits in sizes:
+            inputs = [make_args(bits, rng) for _ in range(4)]
+            limit = SCALING_BUDGET
+            if times: limit = max(limit, times[-1] * (bits / timed[-1]) ** SCALING_EXPONENT)
+            calls, began = 0, perf_counter()
+            if alarm: signal.setitimer(signal.ITIMER_REAL, limit + SCALING_MIN_TIME)
+            try:
+                while (elapsed := perf_counter() - began) < SCALING_MIN_TIME:
+                    function(*inputs[calls % len(inputs)])
+                    calls += 1
+                    if perf_counter() - began > limit: break
+            except TimeoutError:
+                calls = 0
+            finally:
+                if alarm: signal.setitimer(signal.ITIMER_REAL, 0)
+            per_call = elapsed / max(calls, 1) if calls > 1 else perf_counter() - began
+            entry["timings"][bits] = per_call
+            if per_call > limit:
+                entry["error"] = f"over {limit:.2f}s per call at {bits} bits"
+                if times: entry["error"] += f" after {times[-1]:.2g}s at {timed[-1]} bits, faster than bits^{SCALING_EXPONENT}"
+                break
+            timed.append(bits)
+            times.append(per_call)
     except Exception as e:
-        print(f"{name}'s {func_name} has exception {e}")
-        return False
-
-for name, directory in names_to_directories(names):
-    first = name.split()[0]
-    dir_path = os.path.join(os.getcwd(), directory)
-    os.chdir(dir_path)
-    if os.path.isdir(dir_path):
-        try:
-            spec = importlib.util.spec_from_file_location("functions", os.path.join(dir_path, "functions.py"))
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-        except Exception as e:
-            print(f"{name}'s code cannot import: {e}")
-            
-        passes_all = True
-        
-        passes_all &= test_function("block_encode", ['dog: 🐶', 4], [1685022522, 552640400, 3053453312], module, first)
-        passes_all &= test_function("block_decode", [[1685022522, 552640400, 3053453312], 4], 'dog: 🐶', module, first)
-        passes_all &= test_function("affine_encrypt", [[1685022522, 552640400, 3053453312], (123456789, 987654321), 4], [4115223155, 1183960961, 685664433], module, first)
-        passes_all &= test_function("gcd", [2024, 748], 44, module, first)
-        passes_all &= test_function("egcd", [2024, 748], (44, -7, 19), module, first)
-        passes_all &= test_function("multiplicative_inverse", [33, 256], 225, module, first)
-        passes_all &= test_function("affine_decrypt", [[4115223155, 1183960961, 685664433], (123456789, 987654321), 4], [1685022522, 552640400, 3053453312], module, first)
-        
-        if passes_all:
-            print(f"All tests passed for {first}!")
+        entry["error"] = f"exception {e!r}"
+    if len(timed) > 1: entry["exponent"] = fit_exponent(timed[-SCALING_TAIL:], times[-SCALING_TAIL:])
+    if entry["error"] is None and entry.get("exponent", 0) > SCALING_EXPONENT:
+        entry["error"] = f"time grows like bits^{entry['exponent']:.1f} (budget bits^{SCALING_EXPONENT})"
+    entry["passed"] = entry["error"] is None
+    entry["seconds"] = perf_counter() - start
+    return entry
+
+def all_tests():
+    """(name, timeout) of every test in the order run_tests runs them."""
+    return [(test[0], TEST_TIMEOUT) for test in TESTS] + [(f"{test[0]} scaling", SCALING_TIMEOUT) for test in SCALING_TESTS]
+
+def load_functions(dir_path):
+    """Import functions.py from dir_path, with the modules next to it importable."""
+    sys.path.insert(0, dir_path)
+    spec = importlib.util.spec_from_file_location("functions", os.path.join(dir_path, "functions.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def run_tests(dir_path, first):
+    """Body of the subprocess grading one student: import functions.py from
+    dir_path and print one JSON line for the import and for each test from
+    number first on (see all_tests), as soon as it finishes."""
+    start = perf_counter()
+    try:
+        module = load_functions(dir_path)
+        error = None
+    except Exception as e:
+        error = f'cannot import: {e!r}'
+    print(json.dumps({"test": "import", "passed": error is None, "seconds": perf_counter() - start, "error": error}), flush=True)
+    if error: return
+    for i, (func_name, args, expected_result) in enumerate(TESTS):
+        if i >= first: print(json.dumps(test_function(func_name, args, expected_result, module)), flush=True)
+    for i, (func_name, make_args, sizes) in enumerate(SCALING_TESTS, start=len(TESTS)):
+        if i >= first: print(json.dumps(scaling_test(func_name, make_args, sizes, module)), flush=True)
+
+def _read_lines(stream, lines):
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+def grade_student(name, directory, backends=BACKENDS):
+    """Grade one student under each backend in backends, in subprocesses
+    with CRYPTO_BACKEND set to it. A subprocess whose current test runs
+    longer than its timeout (TEST_TIMEOUT or SCALING_TIMEOUT) is killed and
+    a new one started at the next test. Returns the student's entry of the
+    report, where each test is tagged with its backend."""
+    dir_path = os.path.join(ROOT, directory)
+    report = {"name": name, "directory": directory, "tests": [], "import_seconds": {}}
+    if not os.path.isdir(dir_path):
+        report["error"] = "directory not found"
+        report["passed"] = False
+        return report
+    for backend in backends:
+        _grade_backend(dir_path, backend, report)
+    report["passed"] = "error" not in report and all(test["passed"] for test in report["tests"])
+    return report
+
+def _grade_backend(dir_path, backend, report):
+    tests = all_tests()
+    env = dict(os.environ, CRYPTO_BACKEND=backend)
+    first = 0
+    while first < len(tests):
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--run-tests", dir_path, str(first)],
+                                   cwd=dir_path, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        lines = queue.Queue()
+        threading.Thread(target=_read_lines, args=(process.stdout, lines), daemon=True).start()
+        pending = [("import", IMPORT_TIMEOUT)] + tests[first:]
+        for i, (test, timeout) in enumerate(pending):
+            try:
+                line = lines.get(timeout=timeout)
+                error = None if line else "crashed"
+            except queue.Empty:
+                line, error = None, "timed out"
+            if error:
+                entry = {"test": test, "passed": False, "seconds": timeout if error == "timed out" else None, "error": error}
+            else:
+                entry = json.loads(line)
+            entry["backend"] = backend
+            if i == 0:
+                if entry["passed"]:
+                    report["import_seconds"][backend] = entry["seconds"]
+                    continue
+                # Without functions.py every remaining test fails.
+                report.setdefault("error", entry["error"])
+                report["tests"] += [{"test": t, "passed": False, "seconds": None, "error": entry["error"], "backend": backend} for t, _ in pending[1:]]
+                first = len(tests)
+                break
+            report["tests"].append(entry)
+            first += 1
+            if error: break
+        process.kill()
+        process.wait()
+
+def print_report(report):
+    first = report["name"].split()[0]
+    if report.get("error") == "directory not found":
+        print(f"'{report['directory']}' not found, ask {first}")
+    elif "error" in report:
+        print(f"{report['name']}'s code {report['error']}")
+    for test in report["tests"]:
+        under = f" with the {test['backend']} backend"
+        if test["error"] == "wrong answer":
+            print(f"{first} code fails on {test['test']}{under}")
+        elif test["test"].endswith(" scaling") and test["error"] and "error" not in report:
+            print(f"{first}'s {test['test'][:-len(' scaling')]} is too slow{under}: {test['error']}")
+        elif test["error"] and "error" not in report:
+            print(f"{first}'s {test['test']} has {test['error']}{under}")
+    if report["passed"]:
+        print(f"All tests passed for {first}!")
+    print('')
+
+def grade(names, report_path=REPORT_PATH, workers=WORKERS):
+    """Grade every student concurrently, print the results in order and
+    write them to report_path as JSON."""
+    students = list(names_to_directories(names))
+    start = perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        reports = list(pool.map(lambda student: grade_student(*student), students))
+    for report in reports:
+        print_report(report)
+    with open(report_path, 'w') as f:
+        json.dump({"seconds": perf_counter() - start, "students": reports}, f, indent=2, ensure_ascii=False)
+    return reports
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--run-tests":
+        run_tests(sys.argv[2], int(sys.argv[3]))
     else:
-        print(f"'{directory}' not found, ask {first}")
-    print('')
\ No newline at end of file
+        grade(names)
@@ -0,0 +1,172 @@
+import codecs
+from EuclidanAlg import egcd
+from FastAffine import batch_inverse
+
+MAX_CANDIDATES = 1 << 16 # keys scored per call before giving up on the rest
+SAMPLE_BLOCKS = 8 # leading blocks decrypted to score a candidate key
+
+def solve_congruence(a: int, c: int, n: int) -> tuple[int, int]:
+    """Solve ax = c mod n.
+
+    Returns:
+        (x0, m) such that the solutions are exactly x = x0 mod m, where
+        m = n / gcd(a, n), or None if there are none
+
+    Examples:
+        >>> solve_congruence(6, 4, 10)
+        (4, 5)
+        >>> solve_congruence(6, 3, 10) is None
+        True
+    """
+    g, x, _ = egcd(a % n, n)
+    if c % g: return None
+    m = n // g
+    return x * (c // g) % m, m
+
+def combine_congruences(r1: int, m1: int, r2: int, m2: int) -> tuple[int, int]:
+    """Chinese remainder theorem for x = r1 mod m1 and x = r2 mod m2, with
+    m1 and m2 not necessarily coprime.
+
+    Returns:
+        (r, lcm(m1, m2)), or None if the congruences are inconsistent
+
+    Examples:
+        >>> combine_congruences(3, 8, 11, 16)
+        (11, 16)
+        >>> combine_congruences(3, 8, 6, 16) is None
+        True
+    """
+    g, p, _ = egcd(m1, m2)
+    if (r2 - r1) % g: return None
+    lcm = m1 // g * m2
+    return (r1 + (r2 - r1) // g * p % (m2 // g) * m1) % lcm, lcm
+
+def crib_blocks(crib, block_size: int, offset: int) -> tuple[int, list[int]]:
+    """Find the plaintext blocks completely covered by crib.
+
+    Args:
+        crib: known str (or bytes) of the message
+        block_size: how many bytes each block contains
+        offset: byte position of crib in the message
+
+    Returns:
+        (index, blocks): the covered blocks, the first of which is
+            block number index of the message
+
+    Examples:
+        >>> crib_blocks('Eric', 4, 0)
+        (0, [1165125987])
+        >>> crib_blocks('xxEric', 4, 2)
+        (1, [1165125987])
+    """
+    if isinstance(crib, str): crib = crib.encode()
+    skip = -offset % block_size
+    blocks = [int.from_bytes(crib[i:i+block_size], 'big')
+              for i in range(skip, len(crib) - block_size + 1, block_size)]
+    return (offset + skip) // block_size, blocks
+
+def key_class(pairs: list[tuple[int, int]], n: int) -> tuple[int, int]:
+    """Find the keys (a, b) with c = am + b mod n for every (m, c) in pairs.
+
+    Returns:
+        (a0, m): the possible a are those with a = a0 mod m; b is then
+            determined by any pair. None if no key fits.
+
+    Examples:
+        >>> key_class([(1, 5), (3, 11)], 256)
+        (3, 128)
+    """
+    (m0, c0), rest = pairs[0], pairs[1:]
+    a0, mod = 0, 1
+    for m, c in rest:
+        solved = solve_congruence(m - m0, c - c0, n)
+        if solved is None: return None
+        combined = combine_congruences(a0, mod, *solved)
+        if combined is None: return None
+        a0, mod = combined
+    return a0, mod
+
+def score_plaintext(blocks: list[int], block_size: int, final: bool = False) -> float:
+    """Fraction of printable characters in the decoding of the leading blocks,
+    or -1 if they are not a valid UTF-8 prefix. If final, blocks is the whole
+    message and the padding of the last block is removed first."""
+    data = b''.join(block.to_bytes(block_size, 'big') for block in blocks)
+    if final: data = data.rstrip(b'\x00')
+    try:
+        text = codecs.getincrementaldecoder('utf-8')().decode(data, final)
+    except UnicodeDecodeError:
+        return -1
+    if not text: return 0
+    return sum(ch.isprintable() or ch in '\n\t' for ch in text) / len(text)
+
+def _constraints(ciphertext, cribs, block_size, tail_bytes):
+    """Yield lists of (plaintext block, ciphertext block) pairs, one for each
+    way of placing the cribs and guessing the final block."""
+    placements = [[]]
+    for crib, offset in cribs:
+        options = []
+        for o in ([offset] if offset is not None else range(len(ciphertext) * block_size)):
+            index, blocks = crib_blocks(crib, block_size, o)
+            if blocks and index + len(blocks) <= len(ciphertext):
+                options.append([(m, ciphertext[index + j]) for j, m in enumerate(blocks)])
+        placements = [p + q for p in placements for q in options]
+    yield from placements
+    # The final block holds 1 to tail_bytes message bytes followed by zero padding.
+    for used in range(1, tail_bytes + 1):
+        shift = 256 ** (block_size - used)
+        for value in range(256 ** (used - 1), 256 ** used):
+            for p in placements:
+                yield p + [(value * shift, ciphertext[-1])]
+
+def recover_affine_keys(ciphertext: list[int], cribs: list[tuple[str, int]], block_size: int = 1,
+                        tail_bytes: int = 0, limit: int = 10) -> list[tuple[float, tuple[int, int]]]:
+    """Known-plaintext attack on affine_encrypt.
+
+    Every placement of the cribs gives pairs (m, c) with c = am + b mod n,
+    which reduce to congruences a(m - m0) = c - c0 mod n. These are solved
+    with their gcds and combined, the possible a of each placement are
+    inverted together with batch_inverse, and each invertible a is scored
+    by decrypting only the first SAMPLE_BLOCKS blocks. Placements that
+    leave more than MAX_CANDIDATES possible keys are skipped, and at most
+    MAX_CANDIDATES keys are scored, most constrained placements first.
+
+    Args:
+        ciphertext: encrypted integers
+        cribs: (text, offset) pairs of known plaintext, where offset is the
+            byte position of text in the message, or None if unknown
+        block_size: how many bytes each block contains
+        tail_bytes: also try guessing that the final block is 1 to tail_bytes
+            message bytes followed by zero padding (256^tail_bytes guesses)
+        limit: how many keys to return
+
+    Returns:
+        up to limit (score, key) pairs, best first, where score is the
+            fraction of printable characters in the sampled plaintext
+
+    Examples:
+        >>> c = [44670773, 1345475665, 3969775157, 198855777, 3505715537, 344291960, 339382097, 609723063]
+        >>> recover_affine_keys(c, [('Meet me ', 0)], 4)
+        [(1.0, (123456789, 987654321))]
+        >>> recover_affine_keys(c, [('the 🐶 p', None)], 4)[0]
+        (1.0, (123456789, 987654321))
+    """
+    n = 256 ** block_size
+    sample = ciphertext[:SAMPLE_BLOCKS]
+    final = len(sample) == len(ciphertext)
+    classes = []
+    for pairs in _constraints(ciphertext, cribs, block_size, tail_bytes):
+        if pairs and (found := key_class(pairs, n)) and n // found[1] <= MAX_CANDIDATES:
+            classes.append((found[1], found[0], pairs[0]))
+    # Most constrained placements first, so loose ones cannot crowd them out.
+    classes.sort(reverse=True)
+    scored = {}
+    for mod, a0, (m0, c0) in classes:
+        candidates = range(a0, n, mod)[:MAX_CANDIDATES - len(scored)]
+        for a, inv in zip(candidates, batch_inverse(candidates, n)):
+            if len(scored) >= MAX_CANDIDATES: break
+            if inv is None: continue
+            key = (a, (c0 - a * m0) % n)
+            if key in scored: continue
+            scored[key] = score_plaintext([inv * (c - key[1]) % n for c in sample], block_size, final)
+    ranked = sorted(((s, k) for k, s in scored.items() if s >= 0), reverse=True)
+    return ranked[:limit]
@@ -0,0 +1,131 @@
+import os
+import EuclidanAlg
+import Instrumentation
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+BACKENDS = ('python', 'gmpy2')
+GMPY2_BITS = 64 # below this CPython ints are as fast as converting to mpz
+
+BACKEND = None
+
+def set_backend(name: str = None) -> str:
+    """Choose the big-integer backend used by gcd, egcd, invert, powmod and
+    is_prime: 'gmpy2' (GMP's mpz) or 'python' (CPython ints). By default
+    this is the CRYPTO_BACKEND environment variable, else gmpy2 if it is
+    installed. Either way every function returns plain ints and bools.
+
+    Returns:
+        the name of the backend now in use
+
+    Raises:
+        ValueError if the backend is unknown or gmpy2 is not installed
+    """
+    global BACKEND
+    name = name or os.environ.get('CRYPTO_BACKEND') or ('gmpy2' if gmpy2 is not None else 'python')
+    if name not in BACKENDS: raise ValueError(f"unknown backend {name!r}, expected one of {BACKENDS}")
+    if name == 'gmpy2' and gmpy2 is None: raise ValueError("the gmpy2 backend needs gmpy2 installed")
+    BACKEND = name
+    return name
+
+def _use_gmpy2(*values) -> bool:
+    return BACKEND == 'gmpy2' and max(values) >> GMPY2_BITS > 0
+
+@Instrumentation.timed
+def gcd(a: int, b: int) -> int:
+    """gcd(a, b), as EuclidanAlg.gcd.
+
+    Examples:
+        >>> gcd(2024, 748)
+        44
+    """
+    if _use_gmpy2(a, b) and a >= 0 and b >= 0: return int(gmpy2.gcd(a, b))
+    return EuclidanAlg.gcd(a, b)
+
+@Instrumentation.timed
+def egcd(a: int, b: int) -> tuple[int, int, int]:
+    """(g, x, y) with ax + by = g = gcd(a, b), exactly as EuclidanAlg.egcd.
+
+    GMP's cofactors agree with EuclidanAlg's for 0 < a != b, 0 < b, so only
+    those go to gmpy2.
+
+    Examples:
+        >>> egcd(2024, 748)
+        (44, -7, 19)
+    """
+    if _use_gmpy2(a, b) and a > 0 and b > 0 and a != b:
+        return tuple(map(int, gmpy2.gcdext(a, b)))
+    return EuclidanAlg.egcd(a, b)
+
+@Instrumentation.timed
+def invert(a: int, n: int) -> int:
+    """a^{-1} mod n, in [0, n).
+
+    Examples:
+        >>> invert(33, 256)
+        225
+
+    Raises:
+        ValueError if gcd(a, n) != 1, because the inverse does not exist
+    """
+    if _use_gmpy2(a, n) and n > 1:
+        try:
+            return int(gmpy2.invert(a, n))
+        except ZeroDivisionError:
+            raise ValueError(f"{a} is not invertible mod {n}") from None
+    g, _, y = EuclidanAlg.egcd(n, a % n)
+    if g != 1: raise ValueError(f"{a} is not invertible mod {n}")
+    return y % n
+
+def powmod(x: int, k: int, n: int) -> int:
+    """x^k mod n, as pow(x, k, n).
+
+    Examples:
+        >>> powmod(61599, 12345, 256**2+1)
+        59696
+    """
+    if Instrumentation.active is not None: Instrumentation.active.count('pow')
+    if _use_gmpy2(n) and k >= 0: return int(gmpy2.powmod(x, k, n))
+    return pow(x, k, n)
+
+def is_prime(n: int, guesses: int = 40) -> bool:
+    """Primality test for n; with gmpy2 this is GMP's Baillie-PSW plus
+    Miller-Rabin, otherwise MillerRabin.is_probably_prime.
+
+    Examples:
+        >>> is_prime(27101712885725450470590282240137)
+        True
+    """
+    if BACKEND == 'gmpy2': return bool(gmpy2.is_prime(n, guesses))
+    from MillerRabin import is_probably_prime
+    return is_probably_prime(n, guesses)
+
+set_backend()
+
+if __name__ == "__main__":
+    import random
+    from time import time
+
+    for backend in [b for b in BACKENDS if b == 'python' or gmpy2 is not None]:
+        set_backend(backend)
+        assert egcd(2024, 748) == (44, -7, 19)
+        assert egcd(1234, 567) == (1, -17, 37)
+        assert egcd(256, 33) == (1, 4, -31)
+        assert invert(33, 256) == 225
+        for bits in [16, 256, 1024]:
+            for _ in range(200):
+                a, b = random.getrandbits(bits) + 1, random.getrandbits(bits) + 1
+                g, x, y = egcd(a, b)
+                assert type(g) is int and g == EuclidanAlg.gcd(a, b) == gcd(a, b) and a * x + b * y == g
+                assert (g, x, y) == EuclidanAlg.egcd(a, b)
+                assert powmod(a, b, b + 2) == pow(a, b, b + 2)
+                if g == 1 and b > 1: assert invert(a, b) == pow(a, -1, b)
+        assert is_prime(2**521 - 1) and not is_prime(2**523 - 1)
+        n = 2**2203 - 1
+        xs = [random.randrange(n) for _ in range(20)]
+        start = time()
+        for x in xs: powmod(x, n - 2, n)
+        print(f'{backend:6}: 20 powmods mod 2^2203 - 1 in {time() - start:.3f}s')
@@ -0,0 +1,168 @@
+from time import time
+import Arithmetic
+import Instrumentation
+from FastAffine import batch_inverse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY_MODULUS_LIMIT = 1 << 32 # residues below this multiply without overflowing uint64
+
+def window_bits(k: int) -> int:
+    """Window width minimizing the multiplications for an exponent of k's size."""
+    bits = k.bit_length()
+    for w, limit in enumerate((24, 80, 240, 672, 1792), start=1):
+        if bits <= limit: return w
+    return 6
+
+def window_schedule(k: int, w: int = None) -> list[tuple[int, int]]:
+    """Sliding-window decomposition of the exponent k.
+
+    Returns:
+        steps (squarings, digit): starting from 1, square squarings times
+            and then multiply by x^digit (digit odd, < 2^w, or 0 for none),
+            which ends at x^k
+
+    Examples:
+        >>> window_schedule(0b1011001, 3)
+        [(0, 5), (1, 1), (3, 1)]
+
+    Raises:
+        ValueError if k < 0
+    """
+    if k < 0: raise ValueError(f"cannot build a window schedule for the negative exponent {k}")
+    w = w or window_bits(k)
+    bits = bin(k)[2:] if k else ''
+    steps, i, pending = [], 0, 0
+    while i < len(bits):
+        if bits[i] == '0':
+            pending += 1
+            i += 1
+            continue
+        j = min(i + w, len(bits))
+        while bits[j - 1] == '0': j -= 1
+        steps.append((pending + j - i, int(bits[i:j], 2)))
+        pending, i = 0, j
+    if pending: steps.append((pending, 0))
+    if steps: steps[0] = (0, steps[0][1])
+    return steps
+
+def _odd_powers(x, digits, mul):
+    """x^d for every odd d up to max(digits), using mul(a, b)."""
+    top = max(digits, default=1)
+    powers = {1: x}
+    if top > 1:
+        x2 = mul(x, x)
+        for d in range(3, top + 1, 2):
+            powers[d] = mul(powers[d - 2], x2)
+    return powers
+
+def multiplications(steps) -> int:
+    """Number of multiplications _run_schedule does per base for steps,
+    counting the odd powers it precomputes.
+
+    Examples:
+        >>> multiplications(window_schedule(0b1011001, 3))
+        10
+    """
+    top = max((d for _, d in steps), default=1)
+    return (top + 1) // 2 * (top > 1) + sum(s for s, _ in steps) + sum(1 for _, d in steps if d)
+
+def _run_schedule(x, steps, mul, one):
+    powers = _odd_powers(x, [d for _, d in steps], mul)
+    r = one
+    for squarings, digit in steps:
+        for _ in range(squarings):
+            r = mul(r, r)
+        if digit: r = mul(r, powers[digit])
+    return r
+
+def montgomery_pow(bases: list[int], k: int, n: int, steps=None) -> list[int]:
+    """x^k mod n for each x, doing every multiplication in Montgomery form
+    (with R = 2^bits) so that reductions are shifts and masks."""
+    if n % 2 == 0: raise ValueError("Montgomery form needs an odd modulus")
+    steps = window_schedule(k) if steps is None else steps
+    bits = n.bit_length()
+    mask = (1 << bits) - 1
+    n_prime = -pow(n, -1, 1 << bits) & mask
+
+    def mul(a, b):
+        t = a * b
+        t = (t + ((t & mask) * n_prime & mask) * n) >> bits
+        return t - n if t >= n else t
+
+    one = (1 << bits) % n
+    # One more multiplication per base takes the result out of Montgomery form.
+    if Instrumentation.active is not None: Instrumentation.active.count('modmul', len(bases) * (multiplications(steps) + 1))
+    # mul(r, 1) takes r back out of Montgomery form.
+    return [mul(_run_schedule((x << bits) % n, steps, mul, one), 1) for x in bases]
+
+def batch_pow(bases, k: int, n: int, montgomery: bool = False):
+    """Compute x^k mod n for a whole batch of x with one shared exponent.
+
+    The sliding-window schedule for k is computed once. For n <= 2^32 and
+    NumPy installed, the schedule is applied to the whole batch as uint64
+    array operations. Otherwise each x goes through Arithmetic.powmod
+    (GMP or CPython's pow, which already run a sliding window in C and,
+    see __main__, beat montgomery_pow written in Python), or through
+    montgomery_pow if asked.
+
+    Args:
+        bases: list (or NumPy array) of ints
+        k: the shared exponent; if negative, the bases are inverted (with
+            batch_inverse) and raised to -k, as pow does
+        n: the modulus
+        montgomery: use montgomery_pow for large n (n must be odd)
+
+    Returns:
+        [pow(x, k, n) for x in bases], as an array if bases is an array
+
+    Examples:
+        >>> batch_pow([61599, 39041], 12345, 256**2+1)
+        [59696, 1847]
+        >>> batch_pow([2**64 + 3, -5], 3, 101) == [pow(2**64 + 3, 3, 101), pow(-5, 3, 101)]
+        True
+        >>> batch_pow([3, 5], -1, 101)
+        [34, 81]
+
+    Raises:
+        ValueError if k < 0 and some base is not invertible mod n
+    """
+    is_array = np is not None and isinstance(bases, np.ndarray)
+    if k < 0:
+        inverses = batch_inverse(bases.tolist() if is_array else bases, n)
+        if None in inverses: raise ValueError(f"base {bases[inverses.index(None)]} is not invertible mod {n}")
+        bases, k = np.array(inverses, dtype=object) if is_array else inverses, -k
+    if np is not None and n <= NUMPY_MODULUS_LIMIT:
+        steps = window_schedule(k)
+        if Instrumentation.active is not None: Instrumentation.active.count('modmul', len(bases) * multiplications(steps))
+        m = np.uint64(n)
+        # Reduced first, so that bases beyond int64 (or negative ones) still fit in uint64.
+        x = (np.asarray(bases) % n if is_array else np.array([b % n for b in bases], dtype=np.int64)).astype(np.uint64)
+        r = _run_schedule(x, steps, lambda a, b: a * b % m, np.full(len(x), 1 % n, dtype=np.uint64))
+        return r if is_array else r.tolist()
+    if is_array: bases = bases.tolist()
+    if montgomery: return montgomery_pow(bases, k, n)
+    return [Arithmetic.powmod(x, k, n) for x in bases]
+
+if __name__ == "__main__":
+    import random
+    from Sieve import next_prime
+
+    for bits in [16, 24, 31, 61, 512, 1024, 2048]:
+        n = next_prime(2**bits + 2**(bits // 2))
+        count = 200_000 if bits < 64 else 50
+        xs = [random.randrange(n) for _ in range(count)]
+        k = random.randrange(n) | 1
+        start = time()
+        expected = [pow(x, k, n) for x in xs]
+        slow = time() - start
+        start = time()
+        assert batch_pow(xs, k, n) == expected
+        fast = time() - start
+        start = time()
+        assert montgomery_pow(xs, k, n) == expected
+        mont = time() - start
+        print(f'{bits:5} bits, {count} blocks: pow {slow:.3f}s, batch_pow {fast:.3f}s, montgomery {mont:.3f}s')
@@ -1,8 +1,37 @@
+import codecs
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CHUNK_SIZE = 1 << 16 # bytes (or characters) handled at a time when streaming
+
+# Block sizes that are a whole machine word, viewed as big-endian unsigned ints.
+NUMPY_DTYPES = {1: '>u1', 2: '>u2', 4: '>u4', 8: '>u8'}
+
+def _split_blocks(seq: bytes, block_size: int):
+    """Read the zero-padded seq as big-endian block_size-byte ints. For word
+    sized blocks this is a zero-copy NumPy view, otherwise a list."""
+    if np is not None and block_size in NUMPY_DTYPES:
+        return np.frombuffer(seq, dtype=NUMPY_DTYPES[block_size])
+    return list(map(int.from_bytes, (seq[i:i+block_size] for i in range(0, len(seq), block_size))))
+
+def _join_blocks(blocks, block_size: int) -> bytes:
+    """Inverse of _split_blocks, accepting a list of ints or an array."""
+    if np is not None and block_size in NUMPY_DTYPES:
+        if isinstance(blocks, np.ndarray) and len(blocks):
+            if int(blocks.min()) < 0: raise OverflowError("can't convert negative block to unsigned")
+            if int(blocks.max()) >> (8 * block_size): raise OverflowError(f"block too big to convert to {block_size} bytes")
+        return np.asarray(blocks, dtype=NUMPY_DTYPES[block_size]).tobytes()
+    return b''.join(block.to_bytes(block_size, 'big') for block in blocks)
+
 def block_decode(blocks: list[int], block_size: int = 1) -> str:
     """Performs the inverse of block_encode
 
     Args:
-        blocks: a list of integers that encode the message
+        blocks: a list (or NumPy array) of integers that encode the message
         block_size: how many bytes each block contains. The final block is padded
             with zeros.
 
@@ -13,23 +42,25 @@ def block_decode(blocks: list[int], block_size: int = 1) -> str:
         >>> block_decode([1685022522, 552640400, 3053453312], 4)
         'dog: 🐶'
     """
-    decoded = [block.to_bytes(block_size, 'big') for block in blocks]
-    decoded[-1] = decoded[-1].rstrip(int(0).to_bytes(1, 'big'))
-    seq = b''
-    for d in decoded:
-        seq += d
-    return seq.decode()
-
-def block_encode(message: str, block_size: int = 1) -> list[int]:
+    seq = _join_blocks(blocks, block_size)
+    if not seq: raise IndexError("no blocks to decode")
+    return (seq[:-block_size] + seq[-block_size:].rstrip(b'\x00')).decode()
+
+def block_encode(message: str, block_size: int = 1, as_array: bool = False) -> list[int]:
     """Perform our encoding scheme to convert a string into a list of integers.
     The string is encoded into UTF-8 and then split into consecutive blocks.
     Each block of bytes is then returned as the corresponding order, in big-byte
     order.
 
+    For block sizes 1, 2, 4 and 8 the padded bytes are converted in one go
+    as a NumPy array (when NumPy is installed).
+
     Args:
         message: string to be encoded
         block_size: how many bytes each block contains. The final block is padded
             with zeros.
+        as_array: return the blocks as a read-only big-endian NumPy array
+            instead of a list (block sizes 1, 2, 4 and 8 only)
 
     Returns:
         blocks: a list of integers that encode the message
@@ -40,9 +71,80 @@ def block_encode(message: str, block_size: int = 1) -> list[int]:
     """
     seq = message.encode()
     seq += int(0).to_bytes((-1 * len(seq)) % block_size, 'big')
-    blocks = [seq[i:i+block_size] for i in range(0, len(seq), block_size)]
-    return list(map(int.from_bytes, blocks))
+    blocks = _split_blocks(seq, block_size)
+    if as_array:
+        if isinstance(blocks, list): raise ValueError(f"no array type for block_size {block_size}")
+        return blocks
+    return blocks if isinstance(blocks, list) else blocks.tolist()
+
+def read_chunks(stream, chunk_size: int = CHUNK_SIZE):
+    """Yield the contents of stream chunk_size at a time. stream may be a
+    text or binary file, a str or bytes, or any iterable of str/bytes chunks."""
+    if isinstance(stream, (str, bytes)):
+        for i in range(0, len(stream), chunk_size):
+            yield stream[i:i+chunk_size]
+    elif hasattr(stream, 'read'):
+        while chunk := stream.read(chunk_size):
+            yield chunk
+    else:
+        yield from stream
+
+def iter_block_encode(stream, block_size: int = 1, chunk_size: int = CHUNK_SIZE):
+    """Streaming version of block_encode.
+
+    Args:
+        stream: text to be encoded, see read_chunks
+        block_size: how many bytes each block contains. The final block is padded
+            with zeros.
+        chunk_size: how much of stream is read at a time
 
+    Yields:
+        the integers block_encode would return for the whole text, keeping
+        only one chunk (plus less than one block) in memory
+
+    Examples:
+        >>> list(iter_block_encode(['do', 'g: 🐶'], 4))
+        [1685022522, 552640400, 3053453312]
+    """
+    held = b''
+    for chunk in read_chunks(stream, chunk_size):
+        if isinstance(chunk, str): chunk = chunk.encode()
+        data = held + chunk
+        cut = len(data) - len(data) % block_size
+        held = data[cut:]
+        blocks = _split_blocks(data[:cut], block_size)
+        yield from (blocks if isinstance(blocks, list) else blocks.tolist())
+    if held:
+        yield int.from_bytes(held + bytes(-len(held) % block_size), 'big')
+
+def iter_block_decode(blocks, block_size: int = 1, chunk_size: int = CHUNK_SIZE):
+    """Streaming version of block_decode.
+
+    Args:
+        blocks: an iterable of integers that encode the message
+        block_size: how many bytes each block contains. The final block is padded
+            with zeros.
+        chunk_size: roughly how many bytes are decoded at a time
+
+    Yields:
+        consecutive pieces of the original string. The last block is held
+        back until the next chunk arrives, so only it has its padding removed.
+
+    Examples:
+        >>> ''.join(iter_block_decode(iter([1685022522, 552640400, 3053453312]), 4, 1))
+        'dog: 🐶'
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    blocks = iter(blocks)
+    per_chunk = max(1, chunk_size // block_size)
+    held = b''
+    while batch := list(islice(blocks, per_chunk)):
+        data = held + _join_blocks(batch, block_size)
+        held = data[-block_size:]
+        if text := decoder.decode(data[:-block_size]):
+            yield text
+    if text := decoder.decode(held.rstrip(b'\x00'), final=True):
+        yield text
 
 if __name__ == "__main__":
     s = 'dog: 🐶'
@@ -50,4 +152,19 @@ if __name__ == "__main__":
 
     assert block_encode(s, 4) == [1685022522, 552640400, 3053453312]
     assert block_decode([1685022522, 552640400, 3053453312], 4) == s
-    assert s == block_decode(block_encode(s, k), k)
\ No newline at end of file
+    assert s == block_decode(block_encode(s, k), k)
+
+    long = s * 1000 + 'end'
+    for k in [1, 3, 4, 10]:
+        for chunk_size in [1, 5, 64]:
+            blocks = list(iter_block_encode(long, k, chunk_size))
+            assert blocks == block_encode(long, k)
+            assert ''.join(iter_block_decode(iter(blocks), k, chunk_size)) == long
+
+    if np is not None:
+        for bad in [[-1, 5], np.array([-1, 5]), [2**32], np.array([2**32])]:
+            try:
+                block_decode(bad, 4)
+                assert False, bad
+            except OverflowError:
+                pass
\ No newline at end of file
@@ -1,19 +1,162 @@
-start_letter = "a"
-end_letter   = "z"
+import codecs
+from functools import lru_cache
+from string import ascii_lowercase
 
-start = ord(start_letter)
-end = ord(end_letter)
-length = end - start + 1
+ALPHABET = ascii_lowercase # characters the ciphers act on, everything else is left as is
+TABLE_CACHE_SIZE = 256 # translation tables kept, keyed by (shift or key, alphabet)
+STREAM_CHUNK = 1 << 16 # characters (or bytes) read at a time by stream
 
-encrypt = lambda message, shift : ''.join(map(chr, [(ord(m) - start + shift) % length + start for m in message]))
-decrypt = lambda message, shift : encrypt(message, (-1 * shift) % length)
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def _tables(source: str, target: str) -> tuple[dict, bytes]:
+    """Tables sending source[i] to target[i], for str.translate and, if the
+    alphabet is ASCII (so each of its characters is one byte of UTF-8),
+    bytes.translate."""
+    text = str.maketrans(source, target)
+    binary = None
+    if source.isascii() and target.isascii():
+        binary = bytes.maketrans(source.encode(), target.encode())
+    return text, binary
 
-substitution = lambda message, key : ''.join([key[ord(m) - start] for m in message])
+def _check_key(key: str, alphabet: str):
+    if len(key) != len(alphabet) or set(key) != set(alphabet):
+        raise ValueError(f"key {key!r} is not a permutation of {alphabet!r}")
 
-def inverse(key):
-    undo = [''] * length
-    for i, k in enumerate(key):
-        undo[ord(k) - start] = chr(i + start)
-    return ''.join(undo)
+def shift_tables(shift: int, alphabet: str = ALPHABET) -> tuple[dict, bytes]:
+    """Translation tables for the shift cipher x -> x + shift on alphabet."""
+    shift %= len(alphabet)
+    return _tables(alphabet, alphabet[shift:] + alphabet[:shift])
 
-undo_substitution = lambda message, key : substitution(message, inverse(key))
+def substitution_tables(key: str, alphabet: str = ALPHABET, undo: bool = False) -> tuple[dict, bytes]:
+    """Translation tables for the substitution sending alphabet[i] to key[i],
+    or back if undo.
+
+    Raises:
+        ValueError if key is not a permutation of alphabet
+    """
+    _check_key(key, alphabet)
+    return _tables(key, alphabet) if undo else _tables(alphabet, key)
+
+def translate(message, tables: tuple[dict, bytes]):
+    """Apply translation tables to a str or UTF-8 bytes message.
+
+    Examples:
+        >>> translate('café'.encode(), shift_tables(1, 'abcdeé'))
+        b'dbfa'
+    """
+    if isinstance(message, str): return message.translate(tables[0])
+    if tables[1] is None: return message.decode().translate(tables[0]).encode()
+    return message.translate(tables[1])
+
+def encrypt(message, shift: int, alphabet: str = ALPHABET):
+    """Caesar cipher: shift every character of message that is in alphabet.
+
+    Examples:
+        >>> encrypt('hello, world', 3)
+        'khoor, zruog'
+        >>> encrypt(b'xyz', 3)
+        b'abc'
+    """
+    return translate(message, shift_tables(shift, alphabet))
+
+def decrypt(message, shift: int, alphabet: str = ALPHABET):
+    """Inverse of encrypt.
+
+    Examples:
+        >>> decrypt('khoor, zruog', 3)
+        'hello, world'
+    """
+    return encrypt(message, -shift, alphabet)
+
+def substitution(message, key: str, alphabet: str = ALPHABET):
+    """Substitution cipher: replace alphabet[i] by key[i].
+
+    Examples:
+        >>> substitution('abc xyz', 'zyxwvutsrqponmlkjihgfedcba')
+        'zyx cba'
+    """
+    return translate(message, substitution_tables(key, alphabet))
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def inverse(key: str, alphabet: str = ALPHABET) -> str:
+    """The key undoing the substitution with key.
+
+    Examples:
+        >>> inverse('bcdefghijklmnopqrstuvwxyza')
+        'zabcdefghijklmnopqrstuvwxy'
+    """
+    _check_key(key, alphabet)
+    return alphabet.translate(str.maketrans(key, alphabet))
+
+def undo_substitution(message, key: str, alphabet: str = ALPHABET):
+    """Inverse of substitution.
+
+    Examples:
+        >>> undo_substitution('zyx cba', 'zyxwvutsrqponmlkjihgfedcba')
+        'abc xyz'
+    """
+    return translate(message, substitution_tables(key, alphabet, undo=True))
+
+def stream(source, destination, tables: tuple[dict, bytes], chunk_size: int = STREAM_CHUNK) -> int:
+    """Translate a file chunk by chunk, e.g.
+    stream(open(a), open(b, 'w'), shift_tables(3)) to Caesar encrypt a into b.
+
+    Each character is translated on its own, so chunks are independent.
+    Text mode files decode and encode across chunk boundaries themselves;
+    binary ones are decoded here when the alphabet is not ASCII.
+
+    Args:
+        source: file object opened for reading, in text or binary mode
+        destination: file object opened for writing, in the same mode
+        tables: from shift_tables or substitution_tables
+        chunk_size: characters (or bytes) per read
+
+    Returns:
+        the number of characters (or bytes) translated
+    """
+    total, decoder = 0, None
+    while chunk := source.read(chunk_size):
+        if isinstance(chunk, bytes) and tables[1] is None:
+            decoder = decoder or codecs.getincrementaldecoder('utf-8')()
+            destination.write(translate(decoder.decode(chunk), tables).encode())
+        else:
+            destination.write(translate(chunk, tables))
+        total += len(chunk)
+    if decoder is not None: decoder.decode(b'', final=True)
+    return total
+
+if __name__ == "__main__":
+    import io
+    import random
+    from string import ascii_letters, printable
+    from time import time
+
+    start, length = ord('a'), 26
+    slow_encrypt = lambda message, shift : ''.join(map(chr, [(ord(m) - start + shift) % length + start for m in message]))
+
+    message = ''.join(random.choices(ascii_lowercase, k=1 << 22))
+    t = time()
+    expected = slow_encrypt(message, 7)
+    slow = time() - t
+    t = time()
+    assert encrypt(message, 7) == expected
+    print(f'{len(message)} characters: per character {slow:.3f}s, table {time() - t:.3f}s')
+
+    key = ''.join(random.sample(ascii_letters, len(ascii_letters)))
+    message = ''.join(random.choices(printable + 'é🐶', k=1 << 16))
+    assert undo_substitution(substitution(message, key, ascii_letters), key, ascii_letters) == message
+    assert substitution(substitution(message, key, ascii_letters), inverse(key, ascii_letters), ascii_letters) == message
+    assert decrypt(encrypt(message.encode(), 5, ascii_letters), 5, ascii_letters) == message.encode()
+
+    destination = io.StringIO()
+    assert stream(io.StringIO(message), destination, shift_tables(11), chunk_size=1000) == len(message)
+    assert destination.getvalue() == encrypt(message, 11)
+
+    # Non-ASCII letters are several bytes of UTF-8, so bytes are translated as text.
+    accented = ascii_lowercase + 'àéèêçôüß'
+    key = ''.join(random.sample(accented, len(accented)))
+    message = ''.join(random.choices(accented + ' .\n🐶', k=1 << 12))
+    assert encrypt(message.encode(), 9, accented) == encrypt(message, 9, accented).encode()
+    assert substitution(message.encode(), key, accented) == substitution(message, key, accented).encode()
+    destination = io.BytesIO()
+    stream(io.BytesIO(message.encode()), destination, substitution_tables(key, accented), chunk_size=7)
+    assert destination.getvalue() == substitution(message, key, accented).encode()
@@ -1,38 +1,178 @@
-def gcd(a: int, b: int) -> int:
-    """Run the euclidean algorithm to compute g = gcd(a,b).
-
-    Args:
-        a, b: ints
-
-    Returns:
-        g = gcd(a,b)
-
-    Examples:
-        >>> gcd(2024, 748)
-        44
-    """
-    if b == 0: return a
-    return gcd(b, a%b)
-
-def egcd(a: int, b: int) -> tuple[int, int, int]:
-    """Run the extended euclidean algorithm to compute g = gcd(a,b) and return x,y such that ax+by = g.
-
-    Args:
-        a, b: ints
-
-    Returns:
-        Triple g, x, y, where g = gcd(a,b) and ax+by = g.
-
-    Examples:
-        >>> egcd(2024, 748)
-        (44, -7, 19)
-    """
-    x, y, next_x, next_y = 0, 1, 1, 0
-    while a:
-        b, a, x, y, next_x, next_y = a, b % a, next_x, next_y, x - next_x * (b // a), y - next_y * (b // a)
-    return b, x, y
-
-if __name__ == "__main__":
-    assert egcd(1234,567) == (1, -17, 37)
-    assert egcd(256, 33) == (1, 4, -31)
-    assert egcd(2024, 748) == (44, -7, 19)
\ No newline at end of file
+import Instrumentation
+
+WORD_BITS = 60 # leading bits of the operands used for a Lehmer step
+LEHMER_BITS = 256 # egcd uses Lehmer steps while the operands have more bits than this
+HALF_GCD_BITS = 1 << 14 # egcd uses the half gcd while the operands have more bits than this
+
+def gcd(a: int, b: int) -> int:
+    """Run the euclidean algorithm to compute g = gcd(a,b).
+
+    Args:
+        a, b: ints
+
+    Returns:
+        g = gcd(a,b)
+
+    Examples:
+        >>> gcd(2024, 748)
+        44
+    """
+    if Instrumentation.active is None:
+        while b:
+            a, b = b, a % b
+        return a
+    steps = 0
+    while b:
+        a, b, steps = b, a % b, steps + 1
+    Instrumentation.active.count('euclid_steps', steps)
+    return a
+
+def _egcd_steps(a, b):
+    x, y, next_x, next_y = 0, 1, 1, 0
+    if Instrumentation.active is None:
+        while a:
+            b, a, x, y, next_x, next_y = a, b % a, next_x, next_y, x - next_x * (b // a), y - next_y * (b // a)
+        return b, x, y
+    steps = 0
+    while a:
+        b, a, x, y, next_x, next_y = a, b % a, next_x, next_y, x - next_x * (b // a), y - next_y * (b // a)
+        steps += 1
+    Instrumentation.active.count('euclid_steps', steps)
+    return b, x, y
+
+def _lehmer_matrix(a, b):
+    """Matrix (A, B, C, D) of as many euclidean steps on a > b as the
+    leading WORD_BITS bits of a determine, so that the remainders after
+    them are A a + B b and C a + D b (Knuth's Algorithm L), and the list of
+    their quotients."""
+    shift = a.bit_length() - WORD_BITS
+    x, y = a >> shift, b >> shift
+    A, B, C, D = 1, 0, 0, 1
+    quotients = []
+    while y + C and y + D:
+        q = (x + A) // (y + C)
+        if q != (x + B) // (y + D): break
+        quotients.append(q)
+        A, B, C, D = C, D, A - q * C, B - q * D
+        x, y = y, x - q * y
+    return (A, B, C, D), quotients
+
+def _half_gcd(a, b):
+    """Run euclidean steps on a >= b >= 0 until b has at most half as many
+    bits as a did, recursing on the leading halves of a and b.
+
+    Quotients found from leading bits can be wrong near the end, so after
+    each recursive call the steps are undone until the remainders satisfy
+    a > b > 0, which holds only if every quotient is correct.
+
+    Returns:
+        (quotients, M, a', b'), where M = (m00, m01, m10, m11) is the product
+        of the matrices [[q, 1], [1, 0]] over the quotients, so that
+        (a, b) = M (a', b')
+    """
+    half = a.bit_length() // 2 + 1
+    quotients, M = [], (1, 0, 0, 1)
+    if a.bit_length() <= HALF_GCD_BITS:
+        while b >> half:
+            (A, B, C, D), found = _lehmer_matrix(a, b) if b.bit_length() > WORD_BITS else ((1, 0, 0, 1), [])
+            if found:
+                a, b = A * a + B * b, C * a + D * b
+                sign = -1 if len(found) % 2 else 1
+                M = _multiply(M, (sign * D, -sign * B, -sign * C, sign * A))
+                quotients += found
+            else:
+                q, r = divmod(a, b)
+                quotients.append(q)
+                M = (q * M[0] + M[1], M[0], q * M[2] + M[3], M[2])
+                a, b = b, r
+        return quotients, M, a, b
+    for step in range(2):
+        if not b >> half: break
+        # The first call gets a down to about 3/4 of its bits, the second to 1/2.
+        shift = half if step == 0 else 2 * half - a.bit_length()
+        found, N, _, _ = _half_gcd(a >> shift, b >> shift)
+        a, b = _apply_inverse(N, a, b, len(found))
+        while found and not a > b > 0:
+            q = found.pop()
+            N = (N[1], N[0] - q * N[1], N[3], N[2] - q * N[3])
+            a, b = q * a + b, a
+        quotients += found
+        M = _multiply(M, N)
+        if b >> half:
+            q, r = divmod(a, b)
+            quotients.append(q)
+            M = (q * M[0] + M[1], M[0], q * M[2] + M[3], M[2])
+            a, b = b, r
+    return quotients, M, a, b
+
+def _multiply(M, N):
+    return (M[0] * N[0] + M[1] * N[2], M[0] * N[1] + M[1] * N[3],
+            M[2] * N[0] + M[3] * N[2], M[2] * N[1] + M[3] * N[3])
+
+def _apply_inverse(M, a, b, steps):
+    """M^{-1} (a, b), where M has determinant (-1)^steps."""
+    sign = -1 if steps % 2 else 1
+    return sign * (M[3] * a - M[1] * b), sign * (M[0] * b - M[2] * a)
+
+def egcd(a: int, b: int) -> tuple[int, int, int]:
+    """Run the extended euclidean algorithm to compute g = gcd(a,b) and return x,y such that ax+by = g.
+
+    Large operands take the same quotients, and so give the same x and y,
+    as the plain algorithm: above HALF_GCD_BITS bits blocks of quotients are
+    found by _half_gcd, then above LEHMER_BITS bits they are found from the
+    leading WORD_BITS bits with Lehmer steps.
+
+    Args:
+        a, b: ints
+
+    Returns:
+        Triple g, x, y, where g = gcd(a,b) and ax+by = g.
+
+    Examples:
+        >>> egcd(2024, 748)
+        (44, -7, 19)
+    """
+    if a <= 0 or b <= 0 or max(a, b).bit_length() <= LEHMER_BITS: return _egcd_steps(a, b)
+    # The plain algorithm divides b by a first; track the coefficients of a only.
+    big, small, x_big, x_small = (a, b, 1, 0) if a > b else (b, a, 0, 1)
+    # When a > b that first division has quotient 0, still a step of the plain algorithm.
+    if Instrumentation.active is not None and a > b: Instrumentation.active.count('euclid_steps')
+    while small.bit_length() > HALF_GCD_BITS:
+        found, M, big, small = _half_gcd(big, small)
+        if not found:
+            q, r = divmod(big, small)
+            M, found, big, small = (q, 1, 1, 0), [q], small, r
+        x_big, x_small = _apply_inverse(M, x_big, x_small, len(found))
+        if Instrumentation.active is not None: Instrumentation.active.count('euclid_steps', len(found))
+    while small.bit_length() > LEHMER_BITS:
+        (A, B, C, D), found = _lehmer_matrix(big, small)
+        if found:
+            big, small, x_big, x_small = A * big + B * small, C * big + D * small, A * x_big + B * x_small, C * x_big + D * x_small
+        else:
+            q, r = divmod(big, small)
+            big, small, x_big, x_small = small, r, x_small, x_big - q * x_small
+        if Instrumentation.active is not None: Instrumentation.active.count('euclid_steps', len(found) or 1)
+    g, x, y = _egcd_steps(small, big)
+    x = x * x_small + y * x_big
+    return g, x, (g - a * x) // b
+
+if __name__ == "__main__":
+    import random
+    from time import time
+
+    assert egcd(1234,567) == (1, -17, 37)
+    assert egcd(256, 33) == (1, 4, -31)
+    assert egcd(2024, 748) == (44, -7, 19)
+
+    for bits in [300, 3000, 30000, 100000]:
+        fib = [1, 1]
+        while fib[-1].bit_length() < bits: fib.append(fib[-1] + fib[-2])
+        pairs = [(random.getrandbits(bits), random.getrandbits(bits)) for _ in range(10)]
+        pairs += [(fib[-1], fib[-2]), (fib[-2] * 12345, fib[-1] * 12345), (3 << bits, 1 << bits)]
+        assert gcd(fib[-1], fib[-2]) == 1
+        start = time()
+        expected = [_egcd_steps(a, b) for a, b in pairs]
+        slow = time() - start
+        start = time()
+        assert [egcd(a, b) for a, b in pairs] == expected
+        print(f'{bits:6} bits: plain {slow:.3f}s, egcd {time() - start:.3f}s')
@@ -1,3 +1,82 @@
+from array import array
+from collections import OrderedDict
+from EuclidanAlg import gcd
+from FastAffine import multiplicative_inverse
+from BlockEncoder import block_decode
+from Sieve import next_prime
+from BatchExp import batch_pow
+import Instrumentation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TABLE_LIMIT = 1 << 20 # largest p for which x -> x^k mod p is tabulated
+TABLE_CACHE_SIZE = 8 # tables kept, keyed by (k, p)
+TABLE_MIN_BLOCKS = 1 / 16 # use a new table once len(plaintext) >= p * TABLE_MIN_BLOCKS
+
+_tables = OrderedDict()
+
+def exp_table(key: int, p: int):
+    """The permutation x -> x^key mod p as a flat table indexed by x < p,
+    built once per (key, p) and cached.
+
+    With NumPy the table is built by square-and-multiply on all of
+    0, ..., p - 1 at once (products fit in uint64 since p <= TABLE_LIMIT).
+
+    Examples:
+        >>> [int(y) for y in exp_table(3, 7)]
+        [0, 1, 1, 6, 1, 6, 6]
+    """
+    if (key, p) in _tables:
+        _tables.move_to_end((key, p))
+        return _tables[key, p]
+    if np is not None:
+        table, base, k = np.ones(p, dtype=np.uint64), np.arange(p, dtype=np.uint64), key
+        table[0] = 0 if key else 1
+        while k:
+            if k & 1: table = table * base % np.uint64(p)
+            base = base * base % np.uint64(p)
+            k >>= 1
+        table = table.astype(np.uint32)
+        if Instrumentation.active is not None: Instrumentation.active.count('modmul', p * (key.bit_length() + bin(key).count('1')))
+    else:
+        table = array('L', (pow(x, key, p) for x in range(p)))
+        if Instrumentation.active is not None: Instrumentation.active.count('pow', p)
+    _tables[key, p] = table
+    if len(_tables) > TABLE_CACHE_SIZE: _tables.popitem(last=False)
+    return table
+
+def use_exp_table(plaintext, key: int, p: int) -> bool:
+    """Whether exp_encrypt should go through exp_table: p must be small, and
+    the table either already built or cheap relative to the input."""
+    return p <= TABLE_LIMIT and ((key, p) in _tables or len(plaintext) >= p * TABLE_MIN_BLOCKS)
+
+def exp_encrypt_table(plaintext, key: int, p: int):
+    """exp_encrypt by looking every block up in exp_table(key, p).
+
+    Args:
+        plaintext: a list or NumPy array of integers that encode the message
+        key: k to perform f(x) = x^k mod p
+        p: a prime <= TABLE_LIMIT
+
+    Returns:
+        ciphertext: encrypted integers, as a list for a list and a uint32
+            array for an array
+
+    Examples:
+        >>> exp_encrypt_table([61599, 39041], 12345, 256**2+1)
+        [59696, 1847]
+    """
+    table = exp_table(key, p)
+    if np is None:
+        return [table[x % p] for x in plaintext]
+    # mode='wrap' reduces indices mod len(table) = p, matching pow(x, k, p).
+    out = table.take(np.asarray(plaintext, dtype=np.int64), mode='wrap')
+    return out if isinstance(plaintext, np.ndarray) else out.tolist()
+
+@Instrumentation.timed
 def exp_encrypt(plaintext: list[int], key: int, p: int) -> list[int]:
     """Performs the exponentiation cipher on blocks of encoded integers,
     using the function f(x) = x^k mod p.
@@ -14,11 +93,17 @@ def exp_encrypt(plaintext: list[int], key: int, p: int) -> list[int]:
         >>> exp_encrypt([61599, 39041], 12345, 256**2+1)
         [59696, 1847]
 
+    For small p with enough blocks, the blocks are looked up in a cached
+    table instead (see exp_encrypt_table), and otherwise raised to the
+    power key together with batch_pow.
+
     Raises:
         ValueError if f(x) is not invertible
     """
     assert gcd(key, p-1) == 1, ValueError
-    return [pow(x, key, p) for x in plaintext]
+    if use_exp_table(plaintext, key, p):
+        return exp_encrypt_table(plaintext, key, p)
+    return batch_pow(plaintext, key, p)
 
 def exp_decrypt(ciphertext: list[int], key: int, p: int) -> list[int]:
     """Performs the inverse of exp_encrypt.
@@ -34,6 +119,7 @@ def exp_decrypt(ciphertext: list[int], key: int, p: int) -> list[int]:
     Examples:
         >>> exp_decrypt([59696, 1847], 12345, 256**2+1)
         [61599, 39041]
+
     Raises:
         ValueError if f(x) is not invertible
     """
@@ -41,6 +127,7 @@ def exp_decrypt(ciphertext: list[int], key: int, p: int) -> list[int]:
     return exp_encrypt(ciphertext, multiplicative_inverse(key, p-1), p)
 
 if __name__ == "__main__":
+    from KeySearch import scan_exp_keys
 
     ciphertext = [87, 250, 18, 249, 54, 215, 17, 249, 18, 44, 249, 169, 249, 44, 63, 113, 28, 250, 249, 224, 28, 28, 113, 249, 17, 44, 134, 124, 249, 159, 164, 38, 53, 5, 28, 249, 215, 28, 124, 28, 111, 180, 26, 44, 134, 124, 249, 28, 17, 28, 38, 249, 188, 164, 245, 28, 249, 53, 5, 53, 113, 28, 249, 188, 53, 250, 113, 28, 124, 250, 38, 58, 255, 33, 44, 250, 249, 53, 250, 18, 249, 44, 250, 180, 74, 28, 188, 44, 54, 249, 113, 215, 28, 249, 113, 44, 44, 113, 215, 218, 53, 38, 113, 28, 249, 53, 250, 18, 249, 113, 215, 28, 249, 18, 53, 250, 18, 124, 134, 63, 63, 249, 53, 18, 38, 102, 180, 58, 255, 33, 87, 250, 18, 249, 18, 164, 18, 249, 113, 215, 28, 164, 124, 249, 124, 164, 18, 164, 250, 5, 249, 28, 17, 28, 38, 249, 124, 164, 5, 215, 113, 249, 113, 215, 124, 44, 134, 5, 215, 249, 17, 44, 134, 124, 249, 38, 164, 18, 28, 111, 180, 87, 250, 18, 249, 18, 164, 18, 249, 113, 215, 28, 164, 124, 249, 28, 17, 28, 38, 249, 188, 164, 245, 28, 249, 134, 250, 54, 53, 38, 215, 28, 18, 249, 218, 188, 53, 113, 113, 28, 124, 38, 249, 124, 164, 18, 28, 102, 180, 87, 250, 18, 249, 223, 28, 53, 113, 215, 111, 249, 53, 188, 44, 63, 113, 111, 58, 255, 33, 5, 164, 5, 53, 250, 113, 164, 135, 53, 188, 188, 17, 249, 18, 44, 54, 250, 180, 151, 124, 44, 139, 164, 250, 5, 249, 113, 215, 124, 44, 134, 5, 215, 249, 17, 44, 134, 58, 255, 33, 113, 44, 54, 53, 124, 18, 249, 224, 28, 111, 249, 244, 249, 28, 159, 28, 124, 224, 44, 124, 28, 148, 180, 87, 250, 18, 249, 54, 215, 28, 250, 249, 113, 215, 28, 17, 249, 18, 124, 53, 5, 5, 28, 18, 249, 17, 44, 134, 124, 249, 124, 28, 113, 135, 215, 164, 250, 5, 249, 63, 188, 28, 38, 215, 111, 180, 26, 44, 134, 124, 249, 113, 124, 28, 224, 139, 188, 164, 250, 5, 249, 215, 53, 250, 18, 38, 249, 113, 215, 53, 113, 249, 250, 164, 5, 215, 113, 249, 113, 215, 124, 44, 134, 5, 215, 249, 74, 53, 188, 113, 164, 224, 44, 124, 28, 58, 255, 33, 180, 205, 215, 53, 113, 249, 188, 53, 38, 113, 249, 250, 164, 5, 215, 113, 249, 44, 250, 249, 113, 215, 28, 249, 139, 53, 188, 188, 44, 113, 249, 124, 44, 134, 250, 18, 38, 111, 249, 18, 164, 18, 249, 17, 44, 134, 111, 180, 96, 215, 53, 245, 164, 250, 5, 111, 249, 18, 164, 18, 249, 17, 44, 134, 249, 18, 28, 250, 17, 249, 113, 215, 28, 249, 113, 164, 135, 245, 28, 113, 111, 249, 151, 44, 28, 102]
 
@@ -48,11 +135,6 @@ if __name__ == "__main__":
 
     mod = next_prime(256**block_size)
 
-    for key in range(1, mod - 1, 2):
-        try:
-            print(block_decode(exp_encrypt(ciphertext, key, mod), block_size))
-            print(f'key = {multiplicative_inverse(key, mod-1)}\n')
-            # break
-        except:
-            pass
-
+    for score, key, encryption_key in scan_exp_keys(ciphertext, mod, block_size):
+        print(block_decode(exp_encrypt(ciphertext, key, mod), block_size))
+        print(f'key = {encryption_key}, score = {score:.3f}\n')
@@ -0,0 +1,117 @@
+import json
+import sqlite3
+import time
+from collections import Counter as counter, OrderedDict
+import Factorization
+
+MEMORY_SIZE = 4096 # factorizations kept in the in-memory LRU
+DISK_SIZE = 64 << 20 # bytes of encoded factorizations kept in the sqlite file
+
+class FactorCache:
+    """Stores (possibly partial) factorizations of n, as used by Factorization.
+
+    Lookups go through an in-memory LRU first and then, if a path was
+    given, a sqlite file that can be shared between processes and runs.
+    Both are bounded: the LRU by number of entries and the file by the
+    total size of the stored factorizations, evicting the least recently
+    used entries first.
+
+    Examples:
+        >>> cache = FactorCache()
+        >>> cache.put(91, counter({7: 1, 13: 1}), counter())
+        >>> cache.get(91)
+        (Counter({7: 1, 13: 1}), Counter())
+    """
+
+    def __init__(self, path: str = None, memory_size: int = MEMORY_SIZE, disk_size: int = DISK_SIZE):
+        self.memory = OrderedDict()
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.db = None
+        self.disk_used = 0 # this process' running estimate; resynced before evicting
+        if path:
+            self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+            self.db.execute('CREATE TABLE IF NOT EXISTS factors '
+                            '(n TEXT PRIMARY KEY, entry TEXT, size INTEGER, used REAL)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS factors_used ON factors (used)')
+            self.disk_used = self._disk_total()
+
+    def get(self, n: int) -> tuple[counter, counter]:
+        """Return (primes, composites) stored for n, or None."""
+        if n in self.memory:
+            self.memory.move_to_end(n)
+            primes, composites = self.memory[n]
+            return counter(primes), counter(composites)
+        if self.db is None: return None
+        row = self.db.execute('SELECT entry FROM factors WHERE n = ?', (str(n),)).fetchone()
+        if row is None: return None
+        self.db.execute('UPDATE factors SET used = ? WHERE n = ?', (time.time(), str(n)))
+        primes, composites = (counter(dict(pairs)) for pairs in json.loads(row[0]))
+        self._remember(n, primes, composites)
+        return counter(primes), counter(composites)
+
+    def put(self, n: int, primes: counter, composites: counter):
+        """Store the factorization n = prod(primes) * prod(composites)."""
+        self._remember(n, counter(primes), counter(composites))
+        if self.db is None: return
+        entry = json.dumps([list(primes.items()), list(composites.items())])
+        old = self.db.execute('SELECT size FROM factors WHERE n = ?', (str(n),)).fetchone()
+        self.disk_used += len(entry) + len(str(n)) - (old[0] if old else 0)
+        self.db.execute('INSERT OR REPLACE INTO factors VALUES (?, ?, ?, ?)',
+                        (str(n), entry, len(entry) + len(str(n)), time.time()))
+        self._evict()
+
+    def clear(self):
+        self.memory.clear()
+        if self.db is not None:
+            self.db.execute('DELETE FROM factors')
+            self.disk_used = 0
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def _remember(self, n, primes, composites):
+        self.memory[n] = (primes, composites)
+        self.memory.move_to_end(n)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def _disk_total(self):
+        return self.db.execute('SELECT COALESCE(SUM(size), 0) FROM factors').fetchone()[0]
+
+    def _evict(self):
+        if self.disk_used <= self.disk_size: return
+        total = self._disk_total()
+        while total > self.disk_size:
+            rows = self.db.execute('SELECT n, size FROM factors ORDER BY used LIMIT 64').fetchall()
+            freed = 0
+            for key, size in rows:
+                if total - freed <= self.disk_size: break
+                self.db.execute('DELETE FROM factors WHERE n = ?', (key,))
+                freed += size
+            total -= freed
+        self.disk_used = total
+
+def enable_factor_cache(path: str = None, memory_size: int = MEMORY_SIZE, disk_size: int = DISK_SIZE) -> FactorCache:
+    """Make factor, euler_phi and print_factor use a FactorCache.
+
+    Args:
+        path: sqlite file to persist factorizations in, or None to only
+            cache in memory
+        memory_size: number of factorizations kept in memory
+        disk_size: bytes of factorizations kept in the file
+
+    Returns:
+        the cache now in use
+    """
+    cache = FactorCache(path, memory_size, disk_size)
+    Factorization.set_factor_cache(cache)
+    return cache
+
+def disable_factor_cache():
+    """Stop consulting (and close) the cache set by enable_factor_cache."""
+    if Factorization._factor_cache is not None:
+        Factorization._factor_cache.close()
+    Factorization.set_factor_cache(None)
@@ -0,0 +1,301 @@
+import random
+from collections import Counter as counter
+from math import gcd, isqrt
+from MillerRabin import is_probably_prime
+from Sieve import base_primes, primes_in_range, sieve_tables
+import Instrumentation
+
+TRIAL_DIVISION_BOUND = 1 << 12
+RHO_ITERATIONS = 1 << 16 # per call to pollard_brent, before handing over to ECM
+RHO_BATCH = 128 # products accumulated between gcds in pollard_brent
+
+# (B1, curves), roughly the GMP-ECM schedule for factors of 15, 20, ..., 35 digits.
+ECM_SCHEDULE = [(2000, 25), (11000, 90), (50000, 300), (250000, 700), (1000000, 1800)]
+ECM_STAGE2_WIDTH = 210 # giant step D in stage 2
+
+def trial_division(n: int, bound: int = TRIAL_DIVISION_BOUND) -> tuple[counter, int]:
+    """Divide out every prime < bound.
+
+    Returns:
+        (factors, cofactor), where cofactor has no prime factor < bound.
+    """
+    factors = counter()
+    e = (n & -n).bit_length() - 1
+    if e:
+        factors[2] = e
+        n >>= e
+    divisions = 0
+    for p in base_primes(bound - 1):
+        if p * p > n: break
+        divisions += 1
+        while n % p == 0:
+            factors[p] += 1
+            n //= p
+    if Instrumentation.active is not None: Instrumentation.active.count('trial_divisions', divisions)
+    if 1 < n < bound * bound:
+        factors[n] += 1
+        n = 1
+    return factors, n
+
+def perfect_root(n: int) -> int:
+    """Return r > 1 with r^k = n for some prime k >= 2, or None."""
+    for k in primes_in_range(2, n.bit_length() + 1):
+        r = _iroot(n, k)
+        if r ** k == n: return r
+    return None
+
+def _iroot(n, k):
+    r = 1 << -(-n.bit_length() // k)
+    while True:
+        s = ((k - 1) * r + n // r ** (k - 1)) // k
+        if s >= r: return r
+        r = s
+
+def pollard_brent(n: int, c: int = 1, seed: int = 2, iterations: int = RHO_ITERATIONS) -> int:
+    """Brent's variant of Pollard's rho on x -> x^2 + c mod n.
+
+    The differences |x - y| are multiplied together RHO_BATCH at a time so
+    that only one gcd is taken per batch.
+
+    Returns:
+        a nontrivial factor of n, or None if none was found (either the
+        iteration budget ran out or the cycle closed mod n).
+
+    Examples:
+        >>> pollard_brent(107367629 * 536903681) in {107367629, 536903681}
+        True
+    """
+    y, r, q, g = seed, 1, 1, 1
+    steps = multiplications = 0
+    while g == 1:
+        x = y
+        for _ in range(r):
+            y = (y * y + c) % n
+        k = 0
+        while k < r and g == 1:
+            ys = y
+            for _ in range(min(RHO_BATCH, r - k)):
+                y = (y * y + c) % n
+                q = q * abs(x - y) % n
+            g = gcd(q, n)
+            multiplications += 2 * min(RHO_BATCH, r - k)
+            k += RHO_BATCH
+        steps += r
+        multiplications += r
+        r *= 2
+        if g == 1 and steps > iterations: break
+    if Instrumentation.active is not None: Instrumentation.active.count('modmul', multiplications)
+    if g == 1: return None
+    if g == n:
+        # The batch overshot; redo it one step at a time.
+        while True:
+            ys = (ys * ys + c) % n
+            g = gcd(abs(x - ys), n)
+            if g > 1: break
+    return g if g != n else None
+
+def _xdbl(x, z, a24, n):
+    s, d = (x + z) * (x + z) % n, (x - z) * (x - z) % n
+    t = s - d
+    return s * d % n, t * (d + a24 * t) % n
+
+def _xadd(xp, zp, xq, zq, xd, zd, n):
+    u = (xp - zp) * (xq + zq)
+    v = (xp + zp) * (xq - zq)
+    return zd * (u + v) * (u + v) % n, xd * (u - v) * (u - v) % n
+
+def _ladder(k, x, z, a24, n):
+    """Montgomery ladder for k * (x : z)."""
+    x0, z0, x1, z1 = x, z, *_xdbl(x, z, a24, n)
+    for bit in bin(k)[3:]:
+        if bit == '1':
+            x0, z0 = _xadd(x1, z1, x0, z0, x, z, n)
+            x1, z1 = _xdbl(x1, z1, a24, n)
+        else:
+            x1, z1 = _xadd(x1, z1, x0, z0, x, z, n)
+            x0, z0 = _xdbl(x0, z0, a24, n)
+    return x0, z0
+
+def ecm_curve(n: int, B1: int, B2: int = None, sigma: int = None) -> int:
+    """Run Lenstra's elliptic curve method on one Montgomery curve, chosen
+    with Suyama's parametrization, with stage 1 bound B1 and stage 2 bound B2.
+
+    Returns:
+        a nontrivial factor of n, or None
+    """
+    B2 = B2 or 100 * B1
+    sigma = sigma or random.randrange(6, n - 1)
+    u, v = (sigma * sigma - 5) % n, 4 * sigma % n
+    x, z = pow(u, 3, n), pow(v, 3, n)
+    num = pow(v - u, 3, n) * (3 * u + v) % n
+    den = 16 * x * v % n
+    g = gcd(den, n)
+    if g != 1: return g if g != n else None
+    a24 = num * pow(den, -1, n) % n
+
+    for p in primes_in_range(2, B1 + 1):
+        q = p
+        while q * p <= B1: q *= p
+        x, z = _ladder(q, x, z, a24, n)
+    g = gcd(z, n)
+    if g != 1: return g if g != n else None
+
+    # Stage 2: for each prime q = mD +- j in (B1, B2], accumulate x(mD Q) z(jQ) - x(jQ) z(mD Q).
+    D = ECM_STAGE2_WIDTH
+    x2, z2 = _xdbl(x, z, a24, n)
+    baby, prev = {1: (x, z)}, (x, z)
+    cur = _xadd(x2, z2, x, z, x, z, n)
+    for j in range(3, D // 2, 2):
+        baby[j] = cur
+        prev, cur = cur, _xadd(cur[0], cur[1], x2, z2, prev[0], prev[1], n)
+    baby = [xz for j, xz in baby.items() if gcd(j, D) == 1]
+    m = max(2, B1 // D)
+    xD, zD = _ladder(D, x, z, a24, n)
+    R, T = _ladder(m * D, x, z, a24, n), _ladder((m - 1) * D, x, z, a24, n)
+    acc = 1
+    while (m - 1) * D <= B2:
+        for xj, zj in baby:
+            acc = acc * (R[0] * zj - xj * R[1]) % n
+        R, T = _xadd(R[0], R[1], xD, zD, T[0], T[1], n), R
+        m += 1
+    g = gcd(acc, n)
+    return g if 1 < g < n else None
+
+def ecm(n: int, schedule: list[tuple[int, int]] = ECM_SCHEDULE) -> int:
+    """Try curves with growing bounds until one finds a factor of n.
+
+    Returns:
+        a nontrivial factor of n, or None if the schedule is exhausted
+    """
+    for B1, curves in schedule:
+        for _ in range(curves):
+            g = ecm_curve(n, B1)
+            if g: return g
+    return None
+
+def try_split(n: int, schedule: list[tuple[int, int]] = ECM_SCHEDULE) -> int:
+    """Look for a nontrivial factor of the composite n with a bounded amount
+    of rho and then the ECM curves in schedule.
+
+    Returns:
+        a nontrivial factor of n, or None
+    """
+    if n % 2 == 0: return 2
+    r = perfect_root(n)
+    if r: return r
+    for c in (1, 3, 5):
+        g = pollard_brent(n, c)
+        if g: return g
+    return ecm(n, schedule)
+
+def split(n: int) -> int:
+    """Return a nontrivial factor of the composite n."""
+    g = try_split(n)
+    c = 7
+    while not g:
+        g = pollard_brent(n, c, random.randrange(2, n), iterations=isqrt(isqrt(n)) + 1)
+        c += 2
+    return g
+
+_factor_cache = None
+
+def set_factor_cache(cache):
+    """Make factor consult cache (see FactorCache.py); None turns it off."""
+    global _factor_cache
+    _factor_cache = cache
+
+def partial_factor(n: int, schedule: list[tuple[int, int]] = ECM_SCHEDULE) -> tuple[counter, counter]:
+    """Factor n as far as try_split with the given ECM schedule gets.
+
+    If a factor cache is set, the attempt resumes from whatever was stored
+    for n and its result is stored back, so a later call with a longer
+    schedule (or factor) continues from the known factors.
+
+    Returns:
+        (primes, composites): Counters of prime factors and of composite
+            factors that could not be split, with their exponents
+
+    Examples:
+        >>> partial_factor(12 * (10**20 + 39) * (10**21 + 117), schedule=[])
+        (Counter({2: 2, 3: 1}), Counter({100000000000000000050700000000000000004563: 1}))
+    """
+    return _factor(n, lambda m: try_split(m, schedule))
+
+@Instrumentation.timed
+def factor(n: int, prime_test=is_probably_prime) -> counter:
+    """Factor n into primes.
+
+    n covered by Sieve.sieve_tables is factored by following its smallest
+    prime factors, in O(log n). Otherwise primes below TRIAL_DIVISION_BOUND
+    are removed by trial division; the remaining cofactor is split with
+    Pollard-Brent rho, and then ECM, until every piece passes prime_test.
+    If a factor cache is set it is consulted first, and resumed from if it
+    only holds a partial factorization.
+
+    Args:
+        n: the int to factor
+        prime_test: exact primality test for the factors of n, e.g. a
+            prime table lookup when n is below its limit
+
+    Returns:
+        factors: a Counter mapping each prime p | n to its exponent,
+            in increasing order of p
+
+    Examples:
+        >>> factor(2**58 + 1)
+        Counter({5: 1, 107367629: 1, 536903681: 1})
+        >>> factor(10**22 + 1)
+        Counter({89: 1, 101: 1, 1052788969: 1, 1056689261: 1})
+
+    Raises:
+        ValueError if n < 1
+    """
+    spf, _ = sieve_tables()
+    if 0 < n < len(spf):
+        factors = counter()
+        while n > 1:
+            p = int(spf[n]) or n
+            factors[p] += 1
+            n //= p
+        return factors
+    return _factor(n, split, prime_test)[0]
+
+def _product(primes, composites):
+    product = 1
+    for factors in (primes, composites):
+        for p, e in factors.items(): product *= p**e
+    return product
+
+def _factor(n, splitter, prime_test=is_probably_prime):
+    if n < 1: raise ValueError(f"cannot factor {n}")
+    cached = _factor_cache.get(n) if _factor_cache is not None else None
+    if cached and _product(*cached) == n:
+        primes, composites = cached
+        if not composites: return primes, composites
+    else:
+        primes, m = trial_division(n)
+        composites = counter({m: 1}) if m > 1 else counter()
+    stuck = counter()
+    current = None # the factor being worked on, out of composites until it is done
+    try:
+        while composites:
+            current = m, e = composites.popitem()
+            if prime_test(m):
+                primes[m] += e
+            else:
+                d = splitter(m)
+                if d:
+                    composites[d] += e
+                    composites[m // d] += e
+                else:
+                    stuck[m] += e
+            current = None
+    finally:
+        # Also runs on KeyboardInterrupt, so a long factorization keeps its progress.
+        if current is not None:
+            composites[current[0]] += current[1]
+        composites.update(stuck)
+        primes = counter(dict(sorted(primes.items())))
+        if _factor_cache is not None and _product(primes, composites) == n:
+            _factor_cache.put(n, primes, composites)
+    return primes, composites
@@ -1,6 +1,13 @@
+import math
 from time import time
 from BlockEncoder import *
 from EuclidanAlg import *
+import Arithmetic
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def multiplicative_inverse(a: int, n: int) -> int:
     """Find the multiplicative inverse a^{-1} mod n.
@@ -20,6 +27,43 @@ def multiplicative_inverse(a: int, n: int) -> int:
     """
     return (egcd(n, a)[2] + n) % n
 
+def batch_inverse(values: list[int], n: int) -> list[int]:
+    """Find a^{-1} mod n for every a in values with one egcd (Montgomery's trick).
+
+    The inverse of the product of all the values gives each inverse with
+    about three multiplications per value. If the product has no inverse,
+    the values sharing a factor with n are found and left out.
+
+    Args:
+      values: ints
+      n: the modulus
+
+    Returns:
+      Inverses in [0, n) in the order of values, with None for each value
+      that has no inverse mod n
+
+    Examples:
+        >>> batch_inverse([33, 2, 7, 0, 289], 256)
+        [225, None, 183, None, 225]
+    """
+    values = [a % n for a in values]
+    products, acc = [], 1
+    for a in values:
+        acc = acc * a % n
+        products.append(acc)
+    g, _, inv = egcd(n, acc)
+    if g != 1:
+        coprime = [math.gcd(a, n) == 1 for a in values]
+        found = iter(batch_inverse([a for a, ok in zip(values, coprime) if ok], n))
+        return [next(found) if ok else None for ok in coprime]
+    inverses = [0] * len(values)
+    inv %= n
+    for i in range(len(values) - 1, 0, -1):
+        inverses[i] = inv * products[i - 1] % n
+        inv = inv * values[i] % n
+    if values: inverses[0] = inv
+    return inverses
+
 def slow_multiplicative_inverse(a, n):
     """Find a^(-1) mod n"""
     for i in range(n):
@@ -48,7 +92,57 @@ def affine_decrypt(ciphertext: list[int], key: tuple[int, int], block_size: int
         inv = multiplicative_inverse(key[0], 256**block_size)
     return [inv * (b - key[1]) % 256**block_size for b in ciphertext]
 
+def affine_encrypt_array(plaintext, key: tuple[int, int], block_size: int = 1):
+    """Array version of affine_encrypt, for block_size <= 8.
+
+    Since n = 256^block_size divides 2^64, f(x) = ax + b mod n is just
+    wrapping uint64 arithmetic followed by a mask.
+
+    Args:
+        plaintext: NumPy array of blocks, e.g. from block_encode(..., as_array=True)
+        key: (a, b) to perform f(x) = ax + b mod n
+        block_size: how many bytes each block contains
+
+    Returns:
+        ciphertext: uint64 array of encrypted blocks
+
+    Examples:
+        >>> blocks = block_encode('dog: 🐶', 4, as_array=True)
+        >>> affine_encrypt_array(blocks, (123456789, 987654321), 4).tolist()
+        [4115223155, 1183960961, 685664433]
+    """
+    return _affine_array(plaintext, key[0], key[1], 0, block_size)
+
+def affine_decrypt_array(ciphertext, key: tuple[int, int], block_size: int = 1):
+    """Array version of affine_decrypt, for block_size <= 8.
+
+    Examples:
+        >>> blocks = np.array([4115223155, 1183960961, 685664433], dtype=np.uint64)
+        >>> block_decode(affine_decrypt_array(blocks, (123456789, 987654321), 4), 4)
+        'dog: 🐶'
+
+    Raises:
+        ValueError if a is not invertible mod 256^block_size
+    """
+    n = 256**block_size
+    inv = Arithmetic.invert(key[0], n)
+    return _affine_array(ciphertext, inv, 0, key[1], block_size)
+
+def _affine_array(blocks, a, b, shift, block_size):
+    """Compute a(x - shift) + b mod 256^block_size in place on a uint64 copy of blocks."""
+    if block_size > 8: raise ValueError(f"block_size {block_size} does not fit in uint64")
+    mask = 256**block_size - 1
+    x = np.asarray(blocks).astype(np.uint64)
+    if shift: x -= np.uint64(shift & mask)
+    x *= np.uint64(a & mask)
+    if b: x += np.uint64(b & mask)
+    if block_size < 8: x &= np.uint64(mask)
+    return x
+
 if __name__ == "__main__":
+    from AffineSolver import recover_affine_keys
+    from KeySearch import search_affine_keys
+
     # Problem 1
     k = (12345, 6789)
     b = 2
@@ -114,20 +208,11 @@ if __name__ == "__main__":
 
     b = 4
 
-    for end in range(256):
-        last = 256**(b-1) * end
-        k = [0, 0]
-        k[0] = (ciphertext[-1] - ciphertext[0]) * multiplicative_inverse(last - block_encode('Eric', 4)[0], 256**b)
-        k[0] %= 256**b
-        k[1] = ciphertext[-1] - last * k[0]
-        k[1] %= 256**b
-        try:
-            msg = block_decode(affine_decrypt(ciphertext, k, b), b)
-        except:
-            continue
-        print(f'Problem 4: {msg}')
-        print(f'Block : {b}')
-        print(f'Key : {k}\n')
+    _, k = recover_affine_keys(ciphertext, [('Eric', 0)], b, tail_bytes=1)[0]
+    msg = block_decode(affine_decrypt(ciphertext, k, b), b)
+    print(f'Problem 4: {msg}')
+    print(f'Block : {b}')
+    print(f'Key : {list(k)}\n')
 
     # Problem 5
     ciphertext = [27193, 11409, 29220, 42817, 42686, 21599, 6855, 11409, 26311, 3195, 
@@ -136,16 +221,13 @@ if __name__ == "__main__":
     9737, 3985, 62037, 27326, 27904, 16785, 29220, 43954]
 
     b = 2
-    for a in range(1, 256**b, 2):
-        k = [a, (ciphertext[0] - 21608 * a) % 256**b]
-        if (21608 * k[0] + k[1]) % 256**b == 27193 and (25888 * k[0] + k[1]) % 256**b == 11409:
-            try:
-                msg = block_decode(affine_decrypt(ciphertext, k, b), b)
-            except:
-                continue
-            print(f'Problem 5: {msg}')
-            print(f'Block : {b}')
-            print(f'Key : {k}\n')
+    keys, stats = search_affine_keys(ciphertext, b, ('The ', 0))
+    for k in keys:
+        msg = block_decode(affine_decrypt(ciphertext, k, b), b)
+        print(f'Problem 5: {msg}')
+        print(f'Block : {b}')
+        print(f'Key : {list(k)}')
+    print(f"{stats['keys_per_second']:.0f} keys/s\n")
 
     # Problem 6
     ciphertext = [2881562576, 369203058, 73504835, 1526929104, 2259664109, 402991056, 
@@ -158,34 +240,8 @@ if __name__ == "__main__":
 
     b = 4
 
-    for end in range(256):
-        last = 256**(b-1) * end
-        # solve for lower mod system.
-
-        gcd, x, y = egcd(last - block_encode('The ', 4)[0], 256**b)
-        # need to divide out by the gcd
-        # equation is then a*the + b = start
-        #                  a*last + b = end
-        # then we go to
-        # a*(last - the) = end - start mod n
-        mod = 256**b // gcd
-        mult = ((last - block_encode('The ', 4)[0]) / gcd) % mod
-        out = (ciphertext[-1] - ciphertext[0]) / gcd
-        # so now its a * mult = out mod mod
-        inverse = multiplicative_inverse(mult, mod)
-        a_offset = (out * inverse) % mod
-        k = [0, 0]
-        msg = None
-        for left in range(0, 256**b // mod):
-            k[0] = int(left + a_offset)
-            k[1] = (ciphertext[-1] - k[0] * last) % 256**b
-            try:
-                msg = block_decode(affine_decrypt(ciphertext, k, b), b)
-                break
-            except:
-                continue
-        if msg:
-            print(f'Problem 6: {msg}')
-            print(f'Block : {b}')
-            print(f'Key : {k}\n')
-            break
+    _, k = recover_affine_keys(ciphertext, [('The ', 0)], b, tail_bytes=1)[0]
+    msg = block_decode(affine_decrypt(ciphertext, k, b), b)
+    print(f'Problem 6: {msg}')
+    print(f'Block : {b}')
+    print(f'Key : {list(k)}\n')
@@ -0,0 +1,178 @@
+import random
+from functools import lru_cache
+import numpy as np
+from CeaserCipher import ALPHABET, undo_substitution
+from LanguageModel import ENGLISH_FREQUENCIES, ENGLISH_BIGRAMS
+
+RESTARTS = 8 # hill climbs from perturbed starting keys in crack_substitution
+PERTURBATION = 6 # random swaps applied to the best key before each restart
+
+def ngram_counts(message, alphabet: str = ALPHABET) -> tuple[np.ndarray, np.ndarray]:
+    """Count the letters of message and the pairs of adjacent letters in one
+    pass, ignoring characters outside alphabet.
+
+    Returns:
+        (counts, pairs): counts[i] is how often alphabet[i] occurs, and
+            pairs[i, j] how often alphabet[i] is directly followed by alphabet[j]
+
+    Examples:
+        >>> counts, pairs = ngram_counts('abba, cab')
+        >>> counts[:3].tolist(), int(pairs[0, 1]), int(pairs[1, 0])
+        ([3, 3, 1], 2, 1)
+    """
+    n = len(alphabet)
+    if isinstance(message, str): message = message.encode()
+    table = bytearray([255]) * 256
+    for i, ch in enumerate(alphabet.encode('ascii')): table[ch] = i
+    index = np.frombuffer(message.translate(table), dtype=np.uint8)
+    counts = np.bincount(index[index < n], minlength=n)
+    both = (index[:-1] < n) & (index[1:] < n)
+    pairs = np.bincount(index[:-1][both].astype(np.intp) * n + index[1:][both], minlength=n * n)
+    return counts, pairs.reshape(n, n)
+
+def english_frequencies() -> np.ndarray:
+    """Letter probabilities of English, in the order of ALPHABET."""
+    p = np.array([ENGLISH_FREQUENCIES[ch] for ch in ALPHABET])
+    return p / p.sum()
+
+@lru_cache(maxsize=None)
+def english_log_probabilities() -> tuple[np.ndarray, np.ndarray]:
+    """Log probabilities of English letters and letter pairs, in the order
+    of ALPHABET. Pairs missing from ENGLISH_BIGRAMS share the remaining
+    probability as if their letters were independent."""
+    single = english_frequencies()
+    known = np.zeros((26, 26), dtype=bool)
+    pairs = np.outer(single, single)
+    for pair, percent in ENGLISH_BIGRAMS.items():
+        i, j = ALPHABET.index(pair[0]), ALPHABET.index(pair[1])
+        known[i, j], pairs[i, j] = True, percent / 100
+    pairs[~known] *= (1 - pairs[known].sum()) / pairs[~known].sum()
+    return np.log(single), np.log(pairs)
+
+def chi_squared(counts: np.ndarray, expected: np.ndarray = None) -> np.ndarray:
+    """Chi-squared distance from the expected letter distribution (English
+    by default) of the text with letter counts counts, decrypted with every
+    shift at once.
+
+    Returns:
+        chi[s], the statistic for decrypt(text, s)
+    """
+    n = len(counts)
+    expected = english_frequencies() if expected is None else expected
+    expected = expected * counts.sum()
+    # Decrypting with shift s turns letter i into letter i - s, so it counts counts[i + s].
+    shifted = counts[(np.arange(n)[:, None] + np.arange(n)[None, :]) % n]
+    return ((shifted - expected) ** 2 / expected).sum(axis=1)
+
+def crack_caesar(ciphertext) -> int:
+    """Find the shift of a Caesar cipher on English text, by chi-squared
+    against English letter frequencies.
+
+    Returns:
+        shift such that decrypt(ciphertext, shift) is the plaintext
+
+    Examples:
+        >>> from CeaserCipher import encrypt
+        >>> crack_caesar(encrypt('frequency analysis needs a little text to work with', 11))
+        11
+    """
+    return int(np.argmin(chi_squared(ngram_counts(ciphertext)[0])))
+
+def _swap_delta(counts, pairs, logs, log_pairs, key, a, b):
+    """Change in _score when the plaintext letters of ciphertext letters a
+    and b are swapped. Only rows and columns a and b of pairs are affected,
+    so this costs O(26) whatever the length of the text."""
+    x, y = key[a], key[b]
+    delta = (counts[a] - counts[b]) * (logs[y] - logs[x])
+    swapped = key.copy()
+    swapped[a], swapped[b] = y, x
+    lines = [a, b]
+    new_rows, old_rows = log_pairs[swapped[lines]][:, swapped], log_pairs[key[lines]][:, key]
+    delta += (pairs[lines] * (new_rows - old_rows)).sum()
+    new_cols, old_cols = log_pairs[swapped][:, swapped[lines]], log_pairs[key][:, key[lines]]
+    cols = pairs[:, lines] * (new_cols - old_cols)
+    # Entries in rows a and b were already counted.
+    return delta + cols.sum() - cols[lines].sum()
+
+def _score(counts, pairs, logs, log_pairs, key):
+    """Log likelihood of the decryption sending ciphertext letter i to
+    plaintext letter key[i]."""
+    return (counts * logs[key]).sum() + (pairs * log_pairs[key][:, key]).sum()
+
+def _climb(counts, pairs, logs, log_pairs, key):
+    """Swap pairs of plaintext letters while that improves the score."""
+    improved = True
+    while improved:
+        improved = False
+        for a in range(26):
+            for b in range(a + 1, 26):
+                if _swap_delta(counts, pairs, logs, log_pairs, key, a, b) > 1e-9:
+                    key[a], key[b] = key[b], key[a]
+                    improved = True
+    return key
+
+def crack_substitution(ciphertext, restarts: int = RESTARTS, seed: int = None) -> str:
+    """Find the key of a substitution cipher on English text by hill climbing.
+
+    The text is read once to count letters and letter pairs; after that
+    every candidate swap of two letters is scored in O(26) from the counts
+    (see _swap_delta), so each step costs the same for any length of text.
+    The climb starts from matching letters by frequency and is restarted
+    from perturbations of the best key so far.
+
+    Args:
+        ciphertext: str or bytes
+        restarts: how many perturbed restarts
+        seed: for the random perturbations
+
+    Returns:
+        key such that undo_substitution(ciphertext, key) is the plaintext
+    """
+    counts, pairs = ngram_counts(ciphertext)
+    logs, log_pairs = english_log_probabilities()
+    rng = random.Random(seed)
+    # key[c] is the plaintext letter of ciphertext letter c.
+    key = np.empty(26, dtype=np.intp)
+    key[np.argsort(-counts, kind='stable')] = np.argsort(-logs, kind='stable')
+    best = _climb(counts, pairs, logs, log_pairs, key)
+    best_score = _score(counts, pairs, logs, log_pairs, best)
+    for _ in range(restarts):
+        key = best.copy()
+        for _ in range(PERTURBATION):
+            a, b = rng.sample(range(26), 2)
+            key[a], key[b] = key[b], key[a]
+        key = _climb(counts, pairs, logs, log_pairs, key)
+        score = _score(counts, pairs, logs, log_pairs, key)
+        if score > best_score: best, best_score = key, score
+    # substitution sends plaintext letter p to key[p], the inverse of best.
+    encryption = [''] * 26
+    for c, p in enumerate(best): encryption[p] = ALPHABET[c]
+    return ''.join(encryption)
+
+if __name__ == "__main__":
+    import sys
+    from time import time
+    from CeaserCipher import encrypt, substitution
+
+    # Any long English text, lowercased, e.g. a book from Project Gutenberg.
+    text = open(sys.argv[1]).read().lower() if len(sys.argv) > 1 else ' '.join([
+        'it was the best of times it was the worst of times it was the age of wisdom',
+        'it was the age of foolishness it was the epoch of belief it was the epoch of',
+        'incredulity it was the season of light it was the season of darkness it was',
+        'the spring of hope it was the winter of despair we had everything before us',
+        'we had nothing before us we were all going direct to heaven we were all going',
+        'direct the other way in short the period was so far like the present period',
+        'that some of its noisiest authorities insisted on its being received for good',
+        'or for evil in the superlative degree of comparison only'])
+
+    start = time()
+    assert crack_caesar(encrypt(text, 17)) == 17
+    print(f'caesar: {len(text)} characters in {time() - start:.3f}s')
+
+    key = ''.join(random.sample(ALPHABET, 26))
+    ciphertext = substitution(text, key)
+    start = time()
+    found = crack_substitution(ciphertext, seed=0)
+    plaintext = undo_substitution(ciphertext, found)
+    correct = sum(x == y for x, y in zip(plaintext, text)) / len(text)
+    print(f'substitution: {len(text)} characters in {time() - start:.3f}s, {correct:.1%} of characters right')
@@ -3,19 +3,86 @@ from collections import Counter
 from math import log2
 import numpy as np
 import matplotlib.patches as mpatches
+import EuclidanAlg
+from Instrumentation import counting
+
+TILE_BYTES = 1 << 28 # memory budget for one tile of gcd_step_stats
 
 def gcd_steps(a, b):
-    if b == 0: return 1
-    return gcd_steps(b, a%b) + 1
+    """Number of calls the recursive euclidean algorithm makes for gcd(a, b),
+    i.e. steps(a, 0) = 1 and steps(a, b) = steps(b, a % b) + 1.
+
+    For ints this counts the division steps EuclidanAlg.gcd takes. a and
+    b may also be NumPy arrays, which are broadcast against each other.
+    Then the recurrence is run on every pair at once, one vectorized pass
+    per step, on only the pairs that have not finished yet.
+
+    Examples:
+        >>> gcd_steps(2024, 748)
+        6
+        >>> gcd_steps(np.arange(5), np.arange(5)[:, None]).tolist()[3]
+        [2, 3, 4, 2, 3]
+    """
+    if np.ndim(a) == 0 and np.ndim(b) == 0:
+        with counting(timings=False) as counters:
+            EuclidanAlg.gcd(int(a), int(b))
+        return counters.counts['euclid_steps'] + 1
+    a, b = np.broadcast_arrays(np.asarray(a), np.asarray(b))
+    small = max(np.abs(a).max(initial=0), np.abs(b).max(initial=0)) < 2**31
+    a, b = a.astype(np.int32 if small else np.int64), b.astype(np.int32 if small else np.int64)
+    steps = np.ones(a.shape, dtype=np.uint8).ravel()
+    active = np.flatnonzero(b)
+    x, y = a.ravel()[active], b.ravel()[active]
+    while active.size:
+        steps[active] += 1
+        x, y = y, x % y
+        keep = np.flatnonzero(y)
+        active, x, y = active[keep], x[keep], y[keep]
+    return steps.reshape(a.shape)
+
+def gcd_step_stats(n: int, tile_bytes: int = TILE_BYTES) -> tuple[np.ndarray, np.ndarray]:
+    """Statistics of gcd_steps(a, b) over 1 <= a < b < n, computed in tiles
+    of rows b so that at most about tile_bytes are in use at a time.
+
+    Returns:
+        (average, pairs): average[b - 1] is the sum of gcd_steps(a, b) over
+            1 <= a < b divided by b, and pairs lists each distinct (b, steps)
+            as a row
+    """
+    average = np.zeros(max(n - 1, 0))
+    pairs = []
+    # gcd_steps uses about 64 bytes per entry (operands, indices and copies).
+    rows = max(1, tile_bytes // (64 * max(n, 1)))
+    for start in range(1, n, rows):
+        b = np.arange(start, min(start + rows, n))
+        a = np.arange(1, b[-1])
+        steps = gcd_steps(a[None, :], b[:, None])
+        below = a[None, :] < b[:, None]
+        average[b - 1] = np.where(below, steps, 0).sum(axis=1) / b
+        # Encode (b, steps) as one integer to find the distinct pairs with np.unique.
+        codes = np.unique((b[:, None] * 256 + steps)[below])
+        pairs.append(np.stack([codes // 256, codes % 256], axis=1))
+    return average, np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
 
 def plot_2d_function(f, n=10, s=1, cmap='gist_ncar'):
   """Plot the value of f(a,b) for each
         a, b in [0, ..., n-1].
+
+  f is first called once with a row of a and a column of b, for an f that
+  broadcasts like gcd_steps does. If that raises or does not give the
+  whole grid, f is called on each pair of ints instead.
   """
-  X = np.array([[f(i,j) for i in range(j % s, n, s)] for j in range(0, n, s)])
+  values = np.arange(0, n, s)
+  try:
+    X = np.asarray(f(values[None, :], values[:, None]))
+  except Exception:
+    X = None
+  if X is None or X.shape != (len(values), len(values)):
+    X = np.array([[f(int(a), int(b)) for a in values] for b in values])
   im = plt.imshow(X, cmap=cmap)
   values = range(X.max() + 1)
   colors = [ im.cmap(im.norm(value)) for value in values]
+  patches = [mpatches.Patch(color=colors[i], label=f'{values[i]}') for i in range(len(values))]
   plt.legend(handles=patches, bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0. )
 
   plt.xlabel(f'{s}a')
@@ -24,22 +91,9 @@ def plot_2d_function(f, n=10, s=1, cmap='gist_ncar'):
   plt.show()
 
 def plot_gcd_scatter(n=4000):
-    avg = []
-    data = set()
-    for b in range(1, n):
-      s = 0
-      for a in range(1, b):
-        steps = gcd_steps(a, b)
-        s += steps
-        data.add((b, steps))
-      if b > 0:
-        s /= b
-      else:
-        s = 0
-        data.add((b, 0))
-      avg.append(s)
-
-    plt.scatter([d[0] for d in data], [d[1] for d in data], c='red')
+    avg, data = gcd_step_stats(n)
+
+    plt.scatter(data[:, 0], data[:, 1], c='red')
     plt.scatter(list(range(1, n)), avg, c='blue')
     plt.plot(list(range(1, n)), [1.45 * log2(b) + 1.68 for b in range(1, n)], c='pink')
     plt.plot(list(range(1, n)), [0.85 * log2(b) + 0.14 for b in range(1, n)], c='cyan')
@@ -50,4 +104,4 @@ def plot_gcd_scatter(n=4000):
     plt.show()
 
 if __name__ == "__main__":
-    plot_gcd_scatter()
\ No newline at end of file
+    plot_gcd_scatter()
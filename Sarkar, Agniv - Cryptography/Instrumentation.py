@@ -0,0 +1,130 @@
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+HISTOGRAM_BUCKETS = 32 # timing buckets per function: under 1us, then [2^(i-1), 2^i) us, the last open ended
+
+# The Counters being filled, or None when nothing is being counted. Hooks
+# read it as Instrumentation.active, so while it is None each costs one
+# attribute lookup and comparison.
+active = None
+
+class Counters:
+    """Operation counts and timing histograms collected by counting().
+
+    counts is a Counter of operations:
+        euclid_steps: division steps of the euclidean algorithm in EuclidanAlg
+        pow: modular exponentiations done by pow or GMP, each as one operation
+        modmul: modular multiplications done in Python or NumPy (one per element)
+        trial_divisions: primes tried by Factorization.trial_division
+        prime_candidates: sieve survivors next_prime tested with miller_rabin
+
+    timings[name] is the histogram of the running times of the calls of name
+    (see HISTOGRAM_BUCKETS), for the functions decorated with timed: gcd,
+    egcd and invert in Arithmetic (which functions.gcd, egcd and
+    multiplicative_inverse call), exp_encrypt, is_strong_pseudoprime,
+    factor and next_prime.
+
+    Work done inside GMP or in worker processes (Parallel) is only seen as
+    the calls that started it.
+    """
+
+    def __init__(self, timing: bool = True):
+        self.counts = Counter()
+        self.timings = {}
+        self.timing = timing # whether calls of timed functions are recorded
+
+    def count(self, name: str, n: int = 1):
+        self.counts[name] += n
+
+    def record(self, name: str, seconds: float):
+        """Add a call of name that took seconds to its histogram."""
+        histogram = self.timings.get(name)
+        if histogram is None: histogram = self.timings[name] = [0] * HISTOGRAM_BUCKETS
+        histogram[min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def calls(self, name: str) -> int:
+        return sum(self.timings.get(name, ()))
+
+    def merge(self, other: 'Counters'):
+        self.counts.update(other.counts)
+        for name, histogram in other.timings.items():
+            mine = self.timings.setdefault(name, [0] * HISTOGRAM_BUCKETS)
+            for i, calls in enumerate(histogram): mine[i] += calls
+
+    def report(self) -> str:
+        """The counts, then for each timed function its number of calls and
+        the range of its busiest bucket."""
+        lines = [f'{name:24} {n}' for name, n in sorted(self.counts.items())]
+        for name, histogram in sorted(self.timings.items()):
+            busiest = max(range(HISTOGRAM_BUCKETS), key=histogram.__getitem__)
+            low = 0 if busiest == 0 else 1 << busiest - 1
+            lines.append(f'{name:24} {sum(histogram)} calls, most in [{low}, {1 << busiest}) us')
+        return '\n'.join(lines)
+
+@contextmanager
+def counting(timings: bool = True):
+    """Count operations, and time calls if timings, while inside the block.
+
+    Blocks can be nested; an inner block only sees what happens inside it,
+    and that is added to the outer one when it ends. An inner block inside
+    one that times calls times them too. Counting is per process and not
+    thread-safe.
+
+    Examples:
+        >>> import EuclidanAlg
+        >>> with counting() as counters:
+        ...     _ = EuclidanAlg.gcd(2024, 748)
+        >>> counters.counts['euclid_steps']
+        5
+
+        Calls are recorded however the function was imported:
+
+        >>> from Arithmetic import gcd
+        >>> with counting() as counters:
+        ...     _ = gcd(2024, 748), gcd(10**30, 6**40)
+        >>> counters.calls('gcd')
+        2
+        >>> with counting(timings=False) as counters:
+        ...     _ = gcd(2024, 748)
+        >>> counters.calls('gcd')
+        0
+    """
+    global active
+    outer = active
+    active = counters = Counters(timings or (outer is not None and outer.timing))
+    try:
+        yield counters
+    finally:
+        active = outer
+        if outer is not None: outer.merge(counters)
+
+def timed(function):
+    """Decorator recording the running time of each call of function, under
+    function.__name__, while in a counting block that times calls. Outside
+    one a call costs one extra function call and a check of active."""
+    name = function.__name__
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if active is None or not active.timing: return function(*args, **kwargs)
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            if active is not None: active.record(name, perf_counter() - start)
+    return wrapper
+
+if __name__ == "__main__":
+    import random
+    import functions
+    # The hooks read the imported module, not this script.
+    from Instrumentation import counting
+
+    with counting() as counters:
+        for _ in range(100):
+            p = functions.next_prime(random.getrandbits(64))
+            functions.exp_decrypt(functions.exp_encrypt([random.randrange(p) for _ in range(16)], 65537, p), 65537, p)
+            functions.euler_phi(random.getrandbits(48))
+    print(counters.report())
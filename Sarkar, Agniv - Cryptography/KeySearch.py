@@ -0,0 +1,234 @@
+import codecs
+import heapq
+from math import gcd
+from time import time
+from AffineSolver import crib_blocks
+from BlockEncoder import block_decode
+from FastAffine import affine_decrypt, batch_inverse
+from LanguageModel import score_text
+import Parallel
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BATCH_SIZE = 1 << 20 # keys tried per vectorized batch
+CHECK_BLOCKS = 4 # leading blocks decrypted to reject a key before a full decrypt
+PREFIX_BLOCKS = 32 # blocks decrypted to score an exponent key
+SCAN_SHARD = 1 << 12 # exponent keys per task
+
+def inverse_pow2(a):
+    """Inverses of odd uint64 values mod 2^64, by Newton iteration
+    x -> x(2 - ax), which doubles the number of correct bits each step."""
+    x = a.copy() # a * a = 1 mod 8 for odd a
+    for _ in range(5):
+        x *= np.uint64(2) - a * x
+    return x
+
+def plausible_blocks(x, block_size: int):
+    """Mask of the blocks in x whose bytes could all appear in UTF-8 text:
+    printable ASCII, tab, newline, carriage return, or non-ASCII. This is
+    stricter than block_decode, which also accepts NUL and the other
+    control characters."""
+    ok = np.ones(x.shape, dtype=bool)
+    for t in range(block_size):
+        byte = (x >> np.uint64(8 * t)) & np.uint64(0xff)
+        ok &= ((byte >= 0x20) & (byte != 0x7f)) | (byte == 9) | (byte == 10) | (byte == 13)
+    return ok
+
+def _search_setup(ciphertext, block_size, pairs, check_blocks):
+    """Chunk function for Parallel.parallel_map, turning (start, stop) ranges
+    of the keyspace into the keys in them that decrypt ciphertext."""
+    n = 256**block_size
+    mask = np.uint64(n - 1)
+    c = np.array(ciphertext, dtype=np.uint64)
+    known = {j for j, _ in pairs}
+    checked = [j for j in range(min(check_blocks, len(ciphertext) - 1)) if j not in known]
+
+    def keys_in(start, stop):
+        i = np.arange(start, stop, dtype=np.uint64)
+        if pairs:
+            # b is determined by a from the first crib block, the other crib blocks must match.
+            a = np.uint64(2) * i + np.uint64(1)
+            (j0, m0), rest = pairs[0], pairs[1:]
+            b = (c[j0] - a * np.uint64(m0)) & mask
+            keep = np.ones(len(a), dtype=bool)
+            for j, m in rest:
+                keep &= ((a * np.uint64(m) + b) & mask) == c[j]
+            a, b = a[keep], b[keep]
+        else:
+            a = np.uint64(2) * (i // np.uint64(n)) + np.uint64(1)
+            b = i % np.uint64(n)
+        if checked:
+            inv = inverse_pow2(a)
+            keep = np.ones(len(a), dtype=bool)
+            for j in checked:
+                keep &= plausible_blocks(inv * (c[j] - b) & mask, block_size)
+            a, b = a[keep], b[keep]
+        found = []
+        for key in zip(a.tolist(), b.tolist()):
+            try:
+                block_decode(affine_decrypt(ciphertext, key, block_size), block_size)
+            except (UnicodeDecodeError, ValueError):
+                continue
+            found.append(key)
+        return found
+
+    def run(shards):
+        return [key for start, stop in shards for key in keys_in(start, stop)]
+    return run
+
+def search_affine_keys(ciphertext: list[int], block_size: int = 1, crib: tuple[str, int] = None,
+                       check_blocks: int = CHECK_BLOCKS, batch_size: int = BATCH_SIZE,
+                       workers: int = Parallel.WORKERS) -> tuple[list[tuple[int, int]], dict]:
+    """Brute force every affine key (a, b) mod 256^block_size.
+
+    The keyspace is cut into batches that are sharded across worker
+    processes. Within a batch everything is vectorized uint64 arithmetic:
+    keys are rejected if the crib blocks do not encrypt to the ciphertext,
+    or if one of the first check_blocks blocks (but never the last, which
+    holds the zero padding) decrypts to a byte plausible_blocks rules out:
+    NUL or a control character other than tab, newline and carriage
+    return. Only the survivors are fully decrypted.
+
+    Args:
+        ciphertext: encrypted integers
+        block_size: how many bytes each block contains, at most 8
+        crib: optional (text, offset) of known plaintext covering at least
+            one block, which reduces the search to the possible a
+            (2^(8 block_size - 1) keys instead of 2^(16 block_size - 1))
+        check_blocks: how many leading blocks are checked before a full decrypt
+        batch_size: keys per vectorized batch
+        workers: number of processes
+
+    Returns:
+        (keys, stats): the keys passing plausible_blocks on the checked
+            blocks for which block_decode succeeds, and a dict with the
+            number of 'keys' tried, 'seconds' and 'keys_per_second'
+
+    Raises:
+        ValueError if block_size > 8, the crib covers no whole block, or
+            block_size is 8 and there is no crib
+        ImportError if NumPy is not installed
+
+    Examples:
+        >>> keys, stats = search_affine_keys([255, 244, 179, 183, 68, 242, 240, 12], 1)
+        >>> (85, 23) in keys
+        True
+        >>> search_affine_keys([255, 244, 179, 183, 68, 242, 240, 12], 1, ('Hi', 0))[0]
+        [(85, 23)]
+
+        Tabs and line breaks in the plaintext are kept:
+
+        >>> from AffineEncrypt import affine_encrypt
+        >>> from BlockEncoder import block_encode
+        >>> c = affine_encrypt(block_encode('Hi\\tyou,\\r\\nsee\\nyou', 1), (85, 23), 1)
+        >>> keys, _ = search_affine_keys(c, 1, ('Hi', 0))
+        >>> [block_decode(affine_decrypt(c, key, 1), 1) for key in keys]
+        ['Hi\\tyou,\\r\\nsee\\nyou']
+    """
+    n = 256**block_size
+    if np is None: raise ImportError("search_affine_keys needs NumPy")
+    if block_size > 8: raise ValueError(f"block_size {block_size} does not fit in uint64")
+    pairs = []
+    if crib is not None:
+        index, blocks = crib_blocks(crib[0], block_size, crib[1])
+        if not blocks: raise ValueError("crib does not cover a whole block")
+        pairs = [(index + j, m) for j, m in enumerate(blocks) if index + j < len(ciphertext)]
+    if not pairs and block_size == 8: raise ValueError("a 128-bit keyspace needs a crib")
+    total = n // 2 if pairs else n // 2 * n
+    shards = [(start, min(start + batch_size, total)) for start in range(0, total, batch_size)]
+    start = time()
+    if workers > 1 and len(shards) > 1:
+        keys = Parallel.parallel_map(_search_setup, (ciphertext, block_size, pairs, check_blocks),
+                                     shards, chunk_size=1, workers=workers)
+    else:
+        keys = _search_setup(ciphertext, block_size, pairs, check_blocks)(shards)
+    seconds = time() - start
+    return keys, {'keys': total, 'seconds': seconds, 'keys_per_second': total / max(seconds, 1e-9)}
+
+def _prefix_text(blocks, block_size):
+    """Decode the leading blocks of a message, or None if they cannot be
+    the start of block_encode's output."""
+    n = 256**block_size
+    if any(x >= n for x in blocks): return None
+    data = b''.join(x.to_bytes(block_size, 'big') for x in blocks)
+    try:
+        return codecs.getincrementaldecoder('utf-8')().decode(data)
+    except UnicodeDecodeError:
+        return None
+
+def _exp_scan_setup(ciphertext, p, block_size, prefix, top):
+    """Chunk function for Parallel.parallel_map, turning ranges of
+    decryption exponents into the top best scoring (score, d) in them."""
+    sample = ciphertext[:prefix]
+    n = 256**block_size
+
+    def best(shards):
+        found = []
+        for shard in shards:
+            for d in shard:
+                if gcd(d, p - 1) != 1: continue
+                blocks = []
+                for c in sample:
+                    x = pow(c, d, p)
+                    if x >= n: break
+                    blocks.append(x)
+                else:
+                    text = _prefix_text(blocks, block_size)
+                    if text is not None:
+                        heapq.heappush(found, (score_text(text), d))
+                        if len(found) > top: heapq.heappop(found)
+        return found
+    return best
+
+def scan_exp_keys(ciphertext: list[int], p: int, block_size: int = 1, prefix: int = PREFIX_BLOCKS,
+                  top: int = 5, keys: range = None, workers: int = Parallel.WORKERS) -> list[tuple[float, int, int]]:
+    """Find the most plausible keys for the exponentiation cipher mod p.
+
+    Every decryption exponent d coprime to p - 1 is tried on the first
+    prefix blocks only, stopping at the first block that is not a valid
+    block (>= 256^block_size). Surviving prefixes must be valid UTF-8 and
+    are scored with LanguageModel.score_text. The candidates are sharded
+    across worker processes, and the top keys are rescored on the whole
+    ciphertext.
+
+    Args:
+        ciphertext: encrypted integers
+        p: the prime modulus
+        block_size: how many bytes each block contains
+        prefix: how many leading blocks are used to score a key
+        top: how many keys to return
+        keys: decryption exponents to try, by default range(1, p - 1); a
+            step is kept, so range(1, p - 1, 2) only tries odd d
+        workers: number of processes
+
+    Returns:
+        up to top (score, d, k) triples, best first, where d decrypts and
+            k = d^{-1} mod p - 1 is the encryption key
+
+    Examples:
+        >>> from BlockEncoder import block_encode
+        >>> c = [pow(x, 7, 257) for x in block_encode('hello there, general', 1)]
+        >>> scan_exp_keys(c, 257, workers=1)[0][2]
+        7
+        >>> [k for _, _, k in scan_exp_keys(c, 257, keys=range(3, 256, 4), workers=1)]
+        [7]
+    """
+    keys = keys if keys is not None else range(1, p - 1)
+    shards = [keys[i:i + SCAN_SHARD] for i in range(0, len(keys), SCAN_SHARD)]
+    args = (ciphertext, p, block_size, prefix, top)
+    if workers > 1 and len(shards) > 1:
+        found = Parallel.parallel_map(_exp_scan_setup, args, shards, chunk_size=1, workers=workers)
+    else:
+        found = _exp_scan_setup(*args)(shards)
+    ranked = []
+    best = [d for _, d in heapq.nlargest(top, found)]
+    for d, k in zip(best, batch_inverse(best, p - 1)):
+        try:
+            text = block_decode([pow(c, d, p) for c in ciphertext], block_size)
+        except (UnicodeDecodeError, OverflowError):
+            continue
+        ranked.append((score_text(text), d, k))
+    return sorted(ranked, reverse=True)
@@ -0,0 +1,53 @@
+from functools import lru_cache
+from math import log
+
+# Relative frequency (percent) of each letter in English text.
+ENGLISH_FREQUENCIES = {
+    'a': 8.17, 'b': 1.49, 'c': 2.78, 'd': 4.25, 'e': 12.70, 'f': 2.23, 'g': 2.02,
+    'h': 6.09, 'i': 6.97, 'j': 0.15, 'k': 0.77, 'l': 4.03, 'm': 2.41, 'n': 6.75,
+    'o': 7.51, 'p': 1.93, 'q': 0.10, 'r': 5.99, 's': 6.33, 't': 9.06, 'u': 2.76,
+    'v': 0.98, 'w': 2.36, 'x': 0.15, 'y': 1.97, 'z': 0.07,
+}
+
+# Relative frequency (percent) of the most common letter pairs in English text.
+ENGLISH_BIGRAMS = {
+    'th': 3.56, 'he': 3.07, 'in': 2.43, 'er': 2.05, 'an': 1.99, 're': 1.85, 'on': 1.76,
+    'at': 1.49, 'en': 1.45, 'nd': 1.35, 'ti': 1.34, 'es': 1.34, 'or': 1.28, 'te': 1.20,
+    'of': 1.17, 'ed': 1.17, 'is': 1.13, 'it': 1.12, 'al': 1.09, 'ar': 1.07, 'st': 1.05,
+    'to': 1.04, 'nt': 1.04, 'ng': 0.95, 'se': 0.93, 'ha': 0.93, 'as': 0.87, 'ou': 0.87,
+    'io': 0.83, 'le': 0.83, 've': 0.83, 'co': 0.79, 'me': 0.79, 'de': 0.76, 'hi': 0.76,
+    'ri': 0.73, 'ro': 0.73, 'ic': 0.70, 'ne': 0.69, 'ea': 0.69, 'ra': 0.69, 'ce': 0.65,
+    'li': 0.62, 'ch': 0.60, 'll': 0.58, 'be': 0.58, 'ma': 0.57, 'si': 0.55, 'om': 0.55,
+    'ur': 0.54,
+}
+
+# Probability of each class of character in English prose (summing to 1).
+LETTER, UPPER_SHARE, SPACE, DIGIT, PUNCTUATION, OTHER_ASCII, NON_ASCII, CONTROL = \
+    0.76, 0.06, 0.17, 0.01, 0.045, 0.004, 0.0109, 0.0001
+PUNCTUATION_CHARACTERS = ".,'\"!?;:-()\n"
+
+@lru_cache(maxsize=None)
+def char_log_prob(ch: str) -> float:
+    """Log probability of the character ch under a unigram model of English
+    text, where non-ASCII printable characters (e.g. emoji) are uncommon but
+    allowed and control characters are very unlikely."""
+    lower = ch.lower()
+    if lower in ENGLISH_FREQUENCIES:
+        share = UPPER_SHARE if ch != lower else 1 - UPPER_SHARE
+        return log(LETTER * share * ENGLISH_FREQUENCIES[lower] / 100)
+    if ch == ' ': return log(SPACE)
+    if ch in PUNCTUATION_CHARACTERS: return log(PUNCTUATION / len(PUNCTUATION_CHARACTERS))
+    if ch.isdigit() and ch.isascii(): return log(DIGIT / 10)
+    if not ch.isprintable(): return log(CONTROL / 64)
+    if ch.isascii(): return log(OTHER_ASCII / 20)
+    return log(NON_ASCII / 1000)
+
+def score_text(text: str) -> float:
+    """Average log probability per character of text; higher is more English.
+
+    Examples:
+        >>> score_text('the cat sat on the mat') > score_text('xq#zv\\x07 jk~')
+        True
+    """
+    if not text: return float('-inf')
+    return sum(map(char_log_prob, text)) / len(text)
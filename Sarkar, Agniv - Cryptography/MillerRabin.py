@@ -1,25 +1,119 @@
 import random
+import Arithmetic
+import Instrumentation
+
+def small_primes(limit: int) -> list[int]:
+    """Return every prime < limit using a plain sieve of Eratosthenes."""
+    sieve = bytearray([1]) * limit
+    sieve[:2] = b'\x00\x00'
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytes(len(range(i*i, limit, i)))
+    return [i for i, is_p in enumerate(sieve) if is_p]
+
+SMALL_PRIME_LIMIT = 1000
+SMALL_PRIMES = small_primes(SMALL_PRIME_LIMIT)
+
+# (bound, bases): testing every base is a proof of primality for all n < bound.
+DETERMINISTIC_BASES = [
+    (2047, (2,)),
+    (1373653, (2, 3)),
+    (25326001, (2, 3, 5)),
+    (3215031751, (2, 3, 5, 7)),
+    (2152302898747, (2, 3, 5, 7, 11)),
+    (3474749660383, (2, 3, 5, 7, 11, 13)),
+    (341550071728321, (2, 3, 5, 7, 11, 13, 17)),
+    (3825123056546413051, (2, 3, 5, 7, 11, 13, 17, 19, 23)),
+    (318665857834031151167461, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)),
+    (3317044064679887385961981, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)),
+]
 
 def sharkovskii_representation(n: int) -> (int, int):
     """Returns the Sharkovskii Representation of n."""
-    e = 0
-    while n % 2 == 0:
-        e += 1
-        n //= 2
-    return (e, n)
+    e = (n & -n).bit_length() - 1
+    return (e, n >> e)
 
+@Instrumentation.timed
 def is_strong_pseudoprime(n: int, b: int) -> bool:
-    """Perform Miller-Rabin test on base b."""
-    if n % 2 == 0 and n > 2: return False
-    _, exp = sharkovskii_representation(n - 1)
+    """Perform Miller-Rabin test on base b.
+
+    Writes n - 1 = 2^e * q with q odd and checks that either b^q = 1 mod n
+    or b^(2^i * q) = -1 mod n for some 0 <= i < e.
+
+    Examples:
+        >>> is_strong_pseudoprime(2047, 2)
+        True
+        >>> is_strong_pseudoprime(2047, 3)
+        False
+    """
+    if n == 2: return True
+    if n < 2 or n % 2 == 0: return False
+    b %= n
+    if b == 0: return True
+    power, exp = sharkovskii_representation(n - 1)
     root = pow(b, exp, n)
-    return root in {1, n - 1}
+    passed, squarings = root == 1 or root == n - 1, 0
+    while not passed and squarings < power - 1:
+        root = root * root % n
+        squarings += 1
+        if root == 1: break
+        passed = root == n - 1
+    if Instrumentation.active is not None:
+        Instrumentation.active.count('pow')
+        Instrumentation.active.count('modmul', squarings)
+    return passed
+
+def is_probably_prime(n: int, guesses: int = 40) -> bool:
+    """Perform Miller-Rabin test, after trial division by SMALL_PRIMES.
+
+    Args:
+        n: int to test
+        guesses: number of random bases to try when n is too large for
+            DETERMINISTIC_BASES
+
+    Returns:
+        True if n is prime, or (only for n >= 3.3 * 10^24) if n passed
+        every random base, in which case it is composite with probability
+        at most 4^-guesses.
+
+    Examples:
+        >>> is_probably_prime(168003672409)
+        False
+        >>> is_probably_prime(27101712885725450470590282240137)
+        True
+    """
+    if n < 2: return False
+    for p in SMALL_PRIMES:
+        if n % p == 0: return n == p
+    if n < SMALL_PRIME_LIMIT ** 2: return True
+    return miller_rabin(n, guesses)
+
+def miller_rabin(n: int, guesses: int = 40) -> bool:
+    """The Miller-Rabin part of is_probably_prime, without its trial
+    division, for callers that have already sieved n.
+
+    Any n is answered correctly, small or even ones included (like the
+    candidates of Sieve.next_prime for small n), but trial division makes
+    is_probably_prime faster for n that small primes may divide.
+
+    Args:
+        n: int to test
+        guesses: number of random bases to try when n is too large for
+            DETERMINISTIC_BASES
 
-def is_probably_prime(n: int, guesses: int = 1000) -> bool:
-    """Perform Miller-Rabin test for random bases."""
-    for _ in range(max(n, guesses)):
-        b = random.randint(2, n-2)
-        if not is_strong_pseudoprime(n, b):
+    Examples:
+        >>> miller_rabin(2047), miller_rabin(1000003)
+        (False, True)
+        >>> [n for n in range(50) if miller_rabin(n)]
+        [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47]
+    """
+    if Arithmetic.BACKEND == 'gmpy2': return Arithmetic.is_prime(n, guesses)
+    for bound, bases in DETERMINISTIC_BASES:
+        if n < bound:
+            return all(is_strong_pseudoprime(n, b) for b in bases)
+    if not is_strong_pseudoprime(n, 2): return False
+    for _ in range(guesses):
+        if not is_strong_pseudoprime(n, random.randint(3, n - 2)):
             return False
     return True
     
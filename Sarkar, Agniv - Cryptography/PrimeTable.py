@@ -0,0 +1,209 @@
+import os
+import mmap
+import struct
+from Sieve import segments
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b'PRIMETB1'
+HEADER = struct.Struct('<8sQQQ') # magic, limit, number of primes below limit, bytes per index block
+BLOCK_BYTES = 64 # bytes of the bit array (1024 numbers) per entry of the pi index
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'primes.tbl')
+PATH = os.environ.get('PRIME_TABLE', DEFAULT_PATH) # where get_table looks for a table
+
+class PrimeTable:
+    """A prime table file, mapped read-only so that every process opening it
+    shares the same pages.
+
+    The file (little-endian) is a header, then the pi index, then a bit
+    array over the odd numbers: bit i (bit i % 8 of byte i // 8) is set iff
+    2i + 1 is prime. Entry b of the index is the number of primes below the
+    numbers of block b, the BLOCK_BYTES bytes of the bit array from byte
+    b * BLOCK_BYTES, so pi and nth_prime only count bits inside one block.
+
+    Examples:
+        >>> import tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'primes.tbl')
+        >>> with build_prime_table(path, 10**4) as table:
+        ...     table.is_prime(9973), table.pi(9973), table.nth_prime(1229), table.next_prime(9974)
+        (True, 1229, 9973, None)
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.limit, self.count, self.block_bytes = HEADER.unpack_from(self.map)
+        if magic != MAGIC: raise ValueError(f"{path} is not a prime table")
+        self.blocks = -(-_bit_bytes(self.limit) // self.block_bytes)
+        self.bits_offset = HEADER.size + 8 * self.blocks
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _check(self, n):
+        if n >= self.limit: raise ValueError(f"{n} is beyond the table, which stops at {self.limit}")
+
+    def _before(self, block):
+        """Primes below the first number of block."""
+        return struct.unpack_from('<Q', self.map, HEADER.size + 8 * block)[0]
+
+    def _bits(self, start, stop) -> int:
+        """Bytes start to stop of the bit array as one int (bit i of the int
+        is bit i of the slice)."""
+        return int.from_bytes(self.map[self.bits_offset + start:self.bits_offset + stop], 'little')
+
+    def is_prime(self, n: int) -> bool:
+        """Whether n (< limit) is prime, by one bit lookup."""
+        self._check(n)
+        if n % 2 == 0: return n == 2
+        i = n // 2
+        return self.map[self.bits_offset + (i >> 3)] >> (i & 7) & 1 == 1
+
+    def pi(self, x: int) -> int:
+        """The number of primes <= x (< limit)."""
+        self._check(x)
+        if x < 2: return 0
+        i = (x - 1) // 2
+        block = (i >> 3) // self.block_bytes
+        start = block * self.block_bytes
+        below = self._bits(start, (i >> 3) + 1) & (1 << i - 8 * start + 1) - 1
+        return self._before(block) + below.bit_count()
+
+    def nth_prime(self, k: int) -> int:
+        """The k-th prime, counting from nth_prime(1) = 2."""
+        if not 1 <= k <= self.count: raise ValueError(f"the table has primes 1 to {self.count}, not {k}")
+        if k == 1: return 2
+        # The last block with fewer than k primes before it.
+        lo, hi = 0, self.blocks - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._before(mid) < k: lo = mid
+            else: hi = mid - 1
+        start = lo * self.block_bytes
+        bits = self._bits(start, start + self.block_bytes)
+        for _ in range(k - self._before(lo) - 1):
+            bits &= bits - 1
+        return 2 * (8 * start + (bits & -bits).bit_length() - 1) + 1
+
+    def next_prime(self, n: int) -> int:
+        """The first prime >= n, or None if it is not below limit."""
+        if n <= 2: return 2 if self.limit > 2 else None
+        i = n // 2
+        start = i >> 3
+        bits = self._bits(start, start + self.block_bytes) >> (i & 7)
+        while not bits:
+            start += self.block_bytes
+            if start >= self.blocks * self.block_bytes: return None
+            i = 8 * start
+            bits = self._bits(start, start + self.block_bytes)
+        p = 2 * (i + (bits & -bits).bit_length() - 1) + 1
+        return p if p < self.limit else None
+
+    def primes(self, lo: int = 2, hi: int = None):
+        """Generate the primes p with lo <= p < hi (hi at most limit)."""
+        hi = self.limit if hi is None else min(hi, self.limit)
+        if lo <= 2 < hi: yield 2
+        start = max(lo, 3) // 2 >> 3
+        while 8 * start * 2 < hi:
+            bits = self._bits(start, start + self.block_bytes)
+            while bits:
+                p = 2 * (8 * start + (bits & -bits).bit_length() - 1) + 1
+                if p >= hi: return
+                if p >= lo: yield p
+                bits &= bits - 1
+            start += self.block_bytes
+
+def _bit_bytes(limit):
+    return -(-((limit + 1) // 2) // 8) or 1
+
+def _pack(flags: bytes) -> bytes:
+    """Pack bytes of 0 and 1 (a multiple of 8 of them) into bits, little-endian."""
+    if np is not None: return np.packbits(np.frombuffer(flags, dtype=np.uint8), bitorder='little').tobytes()
+    return bytes(sum(flags[i + j] << j for j in range(8)) for i in range(0, len(flags), 8))
+
+def build_prime_table(path: str, limit: int, block_bytes: int = BLOCK_BYTES) -> PrimeTable:
+    """Sieve the primes below limit into a table file at path (see
+    PrimeTable) and open it.
+
+    The file is written next to path and renamed into place, so processes
+    opening path never see a partial table.
+    """
+    bit_bytes = _bit_bytes(limit)
+    blocks = -(-bit_bytes // block_bytes)
+    index = []
+    count = 1 if limit > 2 else 0 # 2 is not in the bit array
+    pending, block = bytearray(b'\x00'), bytearray() # 1 is not prime
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.seek(HEADER.size + 8 * blocks)
+        for start, seg in segments(3, limit):
+            pending += seg
+            whole = len(pending) // 8 * 8
+            block += _pack(pending[:whole])
+            del pending[:whole]
+            while len(block) >= block_bytes:
+                index.append(count)
+                count += int.from_bytes(block[:block_bytes], 'little').bit_count()
+                f.write(block[:block_bytes])
+                del block[:block_bytes]
+        block += _pack(pending + bytes(-len(pending) % 8))
+        block += bytes(bit_bytes - len(index) * block_bytes - len(block))
+        while block:
+            index.append(count)
+            count += int.from_bytes(block[:block_bytes], 'little').bit_count()
+            f.write(block[:block_bytes])
+            del block[:block_bytes]
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, limit, count, block_bytes))
+        f.write(struct.pack(f'<{len(index)}Q', *index))
+    os.replace(temporary, path)
+    return PrimeTable(path)
+
+_table = None
+_looked = False
+
+def get_table() -> PrimeTable:
+    """The table at PATH, opened on the first call and shared by later ones,
+    or None if there is no file there."""
+    global _table, _looked
+    if not _looked:
+        _looked = True
+        if os.path.exists(PATH): _table = PrimeTable(PATH)
+    return _table
+
+def set_table(table: PrimeTable):
+    """Make get_table return table (None for no table)."""
+    global _table, _looked
+    _table, _looked = table, True
+
+if __name__ == "__main__":
+    import sys
+    from time import time
+    from Sieve import prime_pi, primes_in_range
+    import Sieve
+
+    # python PrimeTable.py [limit [path]] builds the table get_table uses.
+    limit = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**8
+    path = sys.argv[2] if len(sys.argv) > 2 else PATH
+    start = time()
+    table = build_prime_table(path, limit)
+    print(f'{table.count} primes below {limit} in {os.path.getsize(path)} bytes, built in {time() - start:.2f}s')
+
+    small = list(primes_in_range(0, 10**5))
+    assert list(table.primes(0, 10**5)) == small
+    assert all(table.nth_prime(k + 1) == p for k, p in enumerate(small))
+    assert all(table.pi(x) == prime_pi(x) for x in range(0, 3000))
+    assert table.pi(limit - 1) == table.count == prime_pi(limit - 1)
+    assert all(table.next_prime(n) == Sieve.next_prime(n) for n in range(0, 3000))
+    start = time()
+    for x in range(2, limit, limit // 1000): table.nth_prime(table.pi(x))
+    print(f'1000 pi and nth_prime lookups in {time() - start:.3f}s')
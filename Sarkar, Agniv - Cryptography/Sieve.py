@@ -0,0 +1,189 @@
+from array import array
+from bisect import bisect_right
+from itertools import compress
+from math import isqrt
+from MillerRabin import small_primes, miller_rabin
+import Instrumentation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SEGMENT_SIZE = 1 << 18 # odd numbers (= bytes) held in memory per segment
+WINDOW_PRIMES_PER_BIT = 1 # next_prime on a b-bit n sieves by the primes below this times b
+TABLE_LIMIT = 1 << 16 # factor and euler_phi look n below this up in sieve_tables, built on first use
+MAX_TABLE_LIMIT = 1 << 32 # smallest prime factors of composites below this fit in 16 bits
+TOTIENT_BLOCK = 1 << 20 # numbers whose totient is computed in one NumPy pass
+
+_base_primes_cache = []
+_base_primes_limit = 0
+
+def base_primes(limit: int) -> list[int]:
+    """Return the odd primes <= limit, reusing (and growing) a module cache."""
+    global _base_primes_cache, _base_primes_limit
+    if limit > _base_primes_limit:
+        _base_primes_limit = max(limit, 2 * _base_primes_limit)
+        _base_primes_cache = small_primes(_base_primes_limit + 1)[1:]
+    if limit == _base_primes_limit:
+        return _base_primes_cache
+    return _base_primes_cache[:bisect_right(_base_primes_cache, limit)]
+
+_spf_table = _phi_table = None
+
+def sieve_tables(limit: int = TABLE_LIMIT):
+    """Smallest prime factor and totient tables of the numbers below limit,
+    built once and kept; a later call with a larger limit rebuilds them,
+    and one with a smaller limit gets the tables already built.
+
+    spf[n] is the smallest prime factor of a composite n, and 0 if n is 0,
+    1 or prime, so that it fits in 16 bits. phi[n] is euler_phi(n) (with
+    phi[0] = 0). Without NumPy they are built by a linear sieve, which
+    visits each composite once, as array('H') and array('L'). With NumPy,
+    spf is filled by slices from the largest sieving prime down, and phi[n]
+    = phi[n / p] * (p or p - 1) for p = spf[n] a block of n at a time.
+
+    Returns:
+        (spf, phi), both of length at least limit
+
+    Examples:
+        >>> spf, phi = sieve_tables(100)
+        >>> int(spf[91]), int(spf[97]), int(phi[91]), int(phi[97])
+        (7, 0, 72, 96)
+
+    Raises:
+        ValueError if limit > MAX_TABLE_LIMIT
+    """
+    global _spf_table, _phi_table
+    if _spf_table is not None and len(_spf_table) >= limit: return _spf_table, _phi_table
+    if limit > MAX_TABLE_LIMIT: raise ValueError(f"sieve tables stop at {MAX_TABLE_LIMIT}")
+    limit = max(limit, TABLE_LIMIT, 2)
+    _spf_table, _phi_table = _numpy_tables(limit) if np is not None else _linear_sieve(limit)
+    return _spf_table, _phi_table
+
+def _linear_sieve(limit):
+    spf, phi = array('H', bytes(2 * limit)), array('L', [0]) * limit
+    phi[1] = 1
+    primes = []
+    for i in range(2, limit):
+        if not spf[i]:
+            primes.append(i)
+            phi[i] = i - 1
+        # i * p has smallest prime factor p for every prime p up to that of i.
+        smallest = spf[i] or i
+        for p in primes:
+            if p > smallest or i * p >= limit: break
+            spf[i * p] = p
+            phi[i * p] = phi[i] * (p if p == smallest else p - 1)
+    return spf, phi
+
+def _numpy_tables(limit):
+    spf = np.zeros(limit, dtype=np.uint16)
+    for p in reversed([2] + base_primes(isqrt(limit - 1))):
+        spf[p * p::p] = p
+    phi = np.zeros(limit, dtype=np.uint32)
+    phi[1] = 1
+    lo = 2
+    while lo < limit:
+        # n / spf[n] <= n / 2 < lo, so those totients are already known.
+        hi = min(2 * lo, lo + TOTIENT_BLOCK, limit)
+        n = np.arange(lo, hi, dtype=np.int64)
+        p = spf[lo:hi].astype(np.int64)
+        p[p == 0] = n[p == 0]
+        m = n // p
+        phi[lo:hi] = phi[m] * np.where(m % p == 0, p, p - 1)
+        lo = hi
+    return spf, phi
+
+def sieve_segment(start: int, size: int, primes: list[int]) -> bytearray:
+    """Sieve the odd numbers start, start + 2, ..., start + 2(size - 1).
+
+    Args:
+        start: an odd int >= 3
+        size: how many odd numbers are in the segment
+        primes: odd sieving primes, in increasing order
+
+    Returns:
+        seg: seg[i] is 1 unless start + 2i has a factor in primes
+            (other than itself)
+    """
+    seg = bytearray([1]) * size
+    end = start + 2 * size
+    for p in primes:
+        first = p * p
+        if first >= end: break
+        if first < start:
+            first = start + (-start % p)
+            if first % 2 == 0: first += p
+        i = (first - start) // 2
+        seg[i::p] = bytes((size - i - 1) // p + 1)
+    return seg
+
+def segments(lo: int, hi: int, segment_size: int = SEGMENT_SIZE):
+    """Yield (start, seg) covering the odd numbers in [max(lo, 3), hi), where
+    seg is the fully sieved segment starting at the odd number start."""
+    lo = max(lo, 3) | 1
+    if lo >= hi: return
+    primes = base_primes(isqrt(hi - 1))
+    while lo < hi:
+        size = min(segment_size, (hi - lo + 1) // 2)
+        yield lo, sieve_segment(lo, size, primes)
+        lo += 2 * size
+
+def primes_in_range(lo: int, hi: int, segment_size: int = SEGMENT_SIZE):
+    """Generate every prime p with lo <= p < hi, in increasing order.
+
+    Memory use is one segment of segment_size bytes plus the sieving primes
+    up to sqrt(hi), regardless of how long the range is.
+
+    Examples:
+        >>> list(primes_in_range(90, 130))
+        [97, 101, 103, 107, 109, 113, 127]
+    """
+    if lo <= 2 < hi: yield 2
+    for start, seg in segments(lo, hi, segment_size):
+        yield from compress(range(start, start + 2 * len(seg), 2), seg)
+
+def prime_pi(x: int, segment_size: int = SEGMENT_SIZE) -> int:
+    """Count the primes <= x.
+
+    Examples:
+        >>> prime_pi(100)
+        25
+        >>> prime_pi(10**6)
+        78498
+    """
+    if x < 2: return 0
+    return 1 + sum(seg.count(1) for _, seg in segments(3, x + 1, segment_size))
+
+@Instrumentation.timed
+def next_prime(n: int) -> int:
+    """Return the first prime >= n.
+
+    Sieves a window of odd candidates at a time by the primes below
+    WINDOW_PRIMES_PER_BIT * n.bit_length(), and checks the survivors with
+    miller_rabin. Removing a prime p from the sieve only costs one Miller-
+    Rabin test per p candidates, so sieving by more primes is slower than
+    testing their multiples. A window that small primes sieve completely
+    has only primes left.
+
+    Examples:
+        >>> next_prime(256)
+        257
+        >>> next_prime(10**12)
+        1000000000039
+    """
+    if n <= 2: return 2
+    n |= 1
+    window = max(64, 2 * n.bit_length())
+    bound = WINDOW_PRIMES_PER_BIT * n.bit_length()
+    while True:
+        hi = n + 2 * window
+        complete = isqrt(hi) <= bound
+        primes = base_primes(isqrt(hi) if complete else bound)
+        seg = sieve_segment(n, window, primes)
+        for c in compress(range(n, hi, 2), seg):
+            if complete: return c
+            if Instrumentation.active is not None: Instrumentation.active.count('prime_candidates')
+            if miller_rabin(c): return c
+        n = hi
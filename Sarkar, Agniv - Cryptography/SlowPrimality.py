@@ -1,4 +1,9 @@
 from collections import Counter as counter
+from math import isqrt
+from Sieve import sieve_tables
+from PrimeTable import get_table
+import Sieve
+import Factorization
 
 def euler_phi(n: int) -> int:
     """Computes the euler phi (totient) function.
@@ -13,14 +18,26 @@ def euler_phi(n: int) -> int:
     Examples:
         >>> euler_phi(100)
         40
+
+    n covered by Sieve.sieve_tables is looked up instead.
     """
+    phi = sieve_tables()[1]
+    if 0 < n < len(phi): return int(phi[n])
     toitent = n
     for p in factor(n): toitent = (p-1) * toitent // p
     return toitent
     # return len([i for i in range(n) if gcd(i,n) == 1])
 
 def is_prime(n: int) -> bool:
-    """Determine if n is prime."""
+    """Determine if n is prime.
+
+    With a prime table (see PrimeTable.get_table), n below its limit is
+    looked up, and n below its limit squared is only divided by primes.
+    """
+    table = get_table()
+    if table is not None and 0 <= n < table.limit: return table.is_prime(n)
+    if table is not None and 2 <= n and isqrt(n) < table.limit:
+        return all(n % p for p in table.primes(2, isqrt(n) + 1))
     if n == 2: return True
     if n < 2 or n % 2 == 0: return False
     i = 3
@@ -30,29 +47,31 @@ def is_prime(n: int) -> bool:
     return True
 
 def next_prime(n: int) -> int:
-    """Return the first prime >= n."""
-    if n == 2: return 3
-    if n % 2 == 0: n -= 1
-    while not is_prime(n):
-        n += 2
-    return n + 1
-
-def factor(n: int):
-    """What data types should factor return?
-    What is the cleanest way to implement trial division?"""
-    factors = counter()
-    while n % 2 == 0:
-        factors[2] += 1
-        n //= 2
-    i = 3
-    while i * i <= n:
-        while n % i == 0:
-            factors[i] += 1
-            n //= i
-        i += 2
-    if n > 1:
-        factors[n] += 1
-    return factors
+    """Return the first prime >= n, from the prime table if there is one
+    and it goes that far, else Sieve.next_prime.
+
+    Examples:
+        >>> next_prime(256)
+        257
+    """
+    table = get_table()
+    p = table.next_prime(n) if table is not None else None
+    return p if p is not None else Sieve.next_prime(n)
+
+def factor(n: int) -> counter:
+    """Factor n into primes, as Factorization.factor.
+
+    With a prime table, n below its limit is factored the same way (and
+    through the same factor cache), but with every primality test a lookup
+    in the table.
+
+    Examples:
+        >>> factor(10**22 + 1)
+        Counter({89: 1, 101: 1, 1052788969: 1, 1056689261: 1})
+    """
+    table = get_table()
+    if table is None or n >= table.limit: return Factorization.factor(n)
+    return Factorization.factor(n, table.is_prime)
 
 def print_factor(n, rep=None):
     factors = factor(n)